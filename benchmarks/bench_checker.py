@@ -0,0 +1,123 @@
+"""
+Time the row checks of the Checker on a synthetic token.csv of --rows rows
+
+    PYTHONPATH=. python benchmarks/bench_checker.py --rows 10000000
+
+Pass --profile to see where the time goes, and --workers to check the file in
+chunks of --chunk-size bytes in parallel processes
+"""
+
+import argparse
+import cProfile
+import csv
+import os
+import pstats
+import shutil
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from uuid import uuid4
+
+from lcpcli.check_files import CHUNK_SIZE, Checker, check_file
+
+UPOS = ["NOUN", "VERB", "ADJ", "ADV", "PRON", "DET", "ADP", "PUNCT"]
+CONFIG = {
+    "meta": {"name": "benchmark"},
+    "firstClass": {"document": "Document", "segment": "Segment", "token": "Token"},
+    "layer": {
+        "Token": {
+            "anchoring": {"stream": True, "time": False, "location": False},
+            "layerType": "unit",
+            "attributes": {
+                "form": {"type": "text", "nullable": False},
+                "lemma": {"type": "text", "nullable": False},
+                "upos": {"type": "categorical", "nullable": True, "values": UPOS},
+                "feats": {"type": "dict", "nullable": True, "keys": {}},
+                "tags": {"type": "labels", "nullable": True, "nlabels": 4},
+                "score": {"type": "number", "nullable": True},
+            },
+        },
+    },
+}
+
+
+def write_tokens(path: str, n_rows: int) -> None:
+    """Write n_rows tokens in 20-token segments to path"""
+    with open(path, "w", encoding="utf-8", newline="") as output:
+        writer = csv.writer(output)
+        writer.writerow(
+            [
+                "token_id",
+                "segment_id",
+                "char_range",
+                "form_id",
+                "lemma_id",
+                "upos",
+                "feats_id",
+                "tags",
+                "score",
+            ]
+        )
+        segment_id = ""
+        for n in range(n_rows):
+            if n % 20 == 0:
+                segment_id = str(uuid4())
+            writer.writerow(
+                [
+                    n + 1,
+                    segment_id,
+                    f"[{n * 6},{n * 6 + 6})",
+                    n % 5000 + 1,
+                    n % 3000 + 1,
+                    UPOS[n % len(UPOS)],
+                    n % 40 + 1,
+                    format(n % 16, "04b"),
+                    n % 100 if n % 7 else "",
+                ]
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp(prefix="lcpcli_bench_")
+    try:
+        write_tokens(os.path.join(directory, "token.csv"), args.rows)
+        checker = Checker(CONFIG)
+        profile = cProfile.Profile() if args.profile else None
+        start = time.perf_counter()
+        if profile:
+            profile.enable()
+        if args.workers > 1:
+            chunks = checker.file_chunks("token.csv", directory, args.chunk_size)
+            print(f"{len(chunks)} chunks in {time.perf_counter() - start:.2f}s")
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                futures = [
+                    executor.submit(
+                        check_file, checker, "token.csv", directory, chunk=chunk
+                    )
+                    for _, chunk in chunks
+                ]
+                for future in futures:
+                    future.result()
+        else:
+            checker.check_existing_file("token.csv", directory)
+        if profile:
+            profile.disable()
+        elapsed = time.perf_counter() - start
+        if profile:
+            pstats.Stats(profile).sort_stats("tottime").print_stats(15)
+        print(
+            f"{args.rows:,} rows in {elapsed:.2f}s ({args.rows / elapsed:,.0f} rows/s)"
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Time the CoNLL-U parser on lcpcli/data/input/in.conllu repeated up to --lines lines
+
+    PYTHONPATH=. python benchmarks/bench_conllu_parser.py --lines 10000000
+
+Pass --profile to see how the time splits between the parser and the builder,
+and --schema with the config.json of a previous conversion to declare the attributes
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import time
+
+from lcpcli.builder import Corpus
+from lcpcli.conllu_builder import CONLLU_COLUMNS, add_documents
+
+IN_CONLLU = os.path.join(
+    os.path.dirname(__file__), "..", "lcpcli", "data", "input", "in.conllu"
+)
+
+
+def scaled_lines(n_lines: int) -> list[str]:
+    """The lines of in.conllu over and over as a single document, about n_lines long"""
+    with open(IN_CONLLU, "r", encoding="utf-8") as input:
+        lines = [line.rstrip("\r\n") for line in input]
+    if lines[-1]:
+        lines.append("")
+    header = ["# global.columns = " + "\t".join(CONLLU_COLUMNS), "# newdoc id = bench"]
+    return header + lines * max(1, round(n_lines / len(lines)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=10_000_000)
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--schema", type=str, default=None)
+    args = parser.parse_args()
+    lines = scaled_lines(args.lines)
+    schema = None
+    if args.schema:
+        with open(args.schema, "r", encoding="utf-8") as schema_file:
+            schema = json.load(schema_file)
+    c = Corpus("benchmark", schema=schema)
+    profile = cProfile.Profile() if args.profile else None
+    start = time.perf_counter()
+    if profile:
+        profile.enable()
+    add_documents(c, lines)
+    if profile:
+        profile.disable()
+    elapsed = time.perf_counter() - start
+    if profile:
+        pstats.Stats(profile).sort_stats("tottime").print_stats(15)
+    print(
+        f"{len(lines):,} lines in {elapsed:.2f}s ({len(lines) / elapsed:,.0f} lines/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
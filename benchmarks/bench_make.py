@@ -0,0 +1,45 @@
+"""
+Time Corpus.make on --tokens tokens with a text attribute of --values distinct values,
+which make turns into a categorical one
+
+    PYTHONPATH=. python benchmarks/bench_make.py --tokens 200000 --values 100
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from lcpcli.builder import Corpus
+
+SEGMENT_LENGTH = 40
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=200_000)
+    parser.add_argument("--values", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    c = Corpus("benchmark")
+    d = c.Document(name="bench")
+    for ns in range(0, args.tokens, SEGMENT_LENGTH):
+        s = d.Segment()
+        for nt in range(ns, min(ns + SEGMENT_LENGTH, args.tokens)):
+            s.Token(f"form{nt % 5000}", pos=f"pos{nt % args.values}")
+        s.make()
+    d.make()
+    destination = tempfile.mkdtemp(prefix="lcpcli_bench_")
+    try:
+        start = time.perf_counter()
+        c.make(destination, workers=args.workers)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(destination, ignore_errors=True)
+    print(
+        f"made {args.tokens:,} tokens in {elapsed:.2f}s ({args.tokens / elapsed:,.0f} tokens/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Time Checker.check_ftsvector on the vectors of --segments segments of --tokens tokens
+
+    PYTHONPATH=. python benchmarks/bench_tsvector.py --segments 1000 --tokens 500
+"""
+
+import argparse
+import time
+
+from lcpcli.check_files import Checker
+
+UPOS = ["NOUN", "VERB", "ADJ", "ADV", "PRON", "DET", "ADP", "PUNCT"]
+
+
+def make_vector(n_tokens: int, seed: int = 0) -> str:
+    """The tsvector of a segment with the form, lemma and upos of n_tokens tokens"""
+    units = []
+    for nt in range(n_tokens):
+        n = seed + nt
+        form = "it''s" if n % 50 == 0 else f"form{n % 5000}"
+        for na, value in enumerate((form, f"lemma{n % 3000}", UPOS[n % len(UPOS)])):
+            units.append(f"'{na + 1}{value}':{nt + 1}")
+    return " ".join(units)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=1000)
+    parser.add_argument("--tokens", type=int, default=500)
+    args = parser.parse_args()
+    vectors = [make_vector(args.tokens, ns) for ns in range(args.segments)]
+    checker = Checker({})
+    start = time.perf_counter()
+    for vector in vectors:
+        checker.check_ftsvector(vector)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.segments:,} segments of {args.tokens} tokens in {elapsed:.2f}s ({args.segments / elapsed:,.0f} segments/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
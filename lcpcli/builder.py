@@ -1,5 +1,6 @@
 # TODO: left_anchor and right_anchor in relation layers
 
+import contextlib
 import csv
 import json
 import os
@@ -7,18 +8,43 @@ import re
 import shutil
 import tempfile
 
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from typing import Any
 from uuid import uuid4
 
-from .utils import esc, sorted_dict, SpillDict, NestedSet
+from . import __version__
+from .utils import (
+    esc,
+    move_file,
+    sorted_dict,
+    NestedSet,
+    SpillStore,
+    COPY_BUFSIZE,
+    DEFAULT_SPILL_BYTES,
+)
 
 ANCHORINGS = ("stream", "time", "location")
-# ATYPES = ("text", "categorical", "number", "dict", "labels")
+# categorical attributes are made as text and converted by Corpus.make
+ATYPES = ("text", "number", "dict", "labels")
 ATYPES_LOOKUP = ("text", "dict", "labels")
+# declared types whose values are written as they are
+ATYPES_AS_IS = ("text", "number")
 NAMEDATALEN = 63
+# inline: when making each segment; deferred: in a batch in Corpus.make; none: no file
+FTS_MODES = ("inline", "deferred", "none")
+# the deferred FTS vectors are written in chunks of at most this many token bytes,
+# each of which only reads the lookup values of its tokens
+FTS_CHUNK_SIZE = 256 * 1024 * 1024
+SHARD_STATE = "shard.json"
+# the list of the shards kept in a cache folder by build_sharded
+CACHE_MANIFEST = "manifest.json"
 PATTERN_TXT = "(must start with a lower case, be at leat 2 characters long and only contain alpha-numerical characters)"
 
 IS_NUM = re.compile(r"^[0-9]+(\.[0-9]+)?$")
+IS_ATTRIBUTE_NAME = re.compile(r"[a-z][a-zA-Z0-9_]+$")
 
 
 def meta_subattr(meta: dict, k: str, v: Any) -> dict:
@@ -37,20 +63,313 @@ def meta_subattr(meta: dict, k: str, v: Any) -> dict:
     return meta
 
 
-def get_layer_method(layer: "Layer"):
-    corpus = layer._corpus
+def merge_subattrs(meta: dict, other: dict) -> dict:
+    """
+    Merge the sub-attributes of other into meta, following the rules of meta_subattr
+    """
+    for k, sub_attr in other.items():
+        if not isinstance(sub_attr, dict):
+            continue
+        merged = meta.setdefault(k, {})
+        if sub_attr.get("type") == "number" and merged.get("type") == "text":
+            continue
+        merged.update(sub_attr)
+    return meta
+
+
+def remap_bits(mask: int, bits: dict[int, int]) -> int:
+    """
+    Move each bit n set in mask to the position bits[n]
+    """
+    remapped = 0
+    while mask:
+        low_bit = mask & -mask
+        remapped |= 1 << bits[low_bit.bit_length() - 1]
+        mask ^= low_bit
+    return remapped
+
+
+def renumber_id(ids: dict[str, str], value: str) -> str:
+    """The new id of value in ids, or value if it was not renumbered"""
+    return ids.get(value, value)
+
+
+def offset_id(offset: int, value: str) -> str:
+    """The (non-empty) id value plus offset"""
+    return str(int(value) + offset) if value else value
+
+
+def remap_label_bits(bits: dict[int, int], value: str) -> str:
+    """The label mask value with its bits remapped, see remap_bits"""
+    return str(remap_bits(int(value or 0), bits))
+
+
+def declared_attributes(schema: dict) -> dict[str, dict[str, dict]]:
+    """
+    The attributes of each layer of schema (the "layer" part of a config.json,
+    or a whole config.json) as Layer.make would have inferred them
+    """
+    ret: dict[str, dict[str, dict]] = {}
+    for layer_name, layer_conf in schema.get("layer", schema).items():
+        is_relation = layer_conf.get("layerType") == "relation"
+        attributes = ret[layer_name] = {}
+        for aname, aopts in layer_conf.get("attributes", {}).items():
+            aopts = {k: v for k, v in aopts.items() if k not in ("values", "isGlobal")}
+            if is_relation and aname in ("left_anchor", "right_anchor"):
+                # the nested sets are not attributes
+                continue
+            if "type" not in aopts:
+                if "entity" in aopts or "name" in aopts:
+                    # source/target of relations: named after the actual attribute
+                    aname = aopts.pop("name", aname)
+                    aopts["type"] = "entity"
+                elif "ref" in aopts:
+                    aopts["type"] = "ref"
+                elif aname == "meta":
+                    aopts["type"] = "dict"
+            elif aopts["type"] == "categorical":
+                # texts are only turned into categorical values by Corpus.make
+                aopts["type"] = "text"
+            assert aopts.get("type") in (*ATYPES, "ref", "entity"), RuntimeError(
+                f"Cannot read the type of the attribute '{aname}' of {layer_name} in the schema"
+            )
+            attributes[aname] = aopts
+    return ret
+
+
+def check_declared_type(layer_name: str, name: str, value: Any, declared: str):
+    """Check that value can be the value of an attribute declared as text or number"""
+    expected = (str, int, float) if declared == "text" else (int, float)
+    assert value is None or isinstance(value, expected), RuntimeError(
+        f"The attribute '{name}' of {layer_name} is declared as {declared} but got {value!r}"
+    )
+
+
+def column_values(values: Any) -> list:
+    """The values of a column as a list of Python objects (eg. from a NumPy array)"""
+    if hasattr(values, "to_pylist"):
+        # Arrow arrays
+        return values.to_pylist()
+    if hasattr(values, "tolist"):
+        # NumPy arrays
+        return values.tolist()
+    return list(values)
+
+
+def column_type(values: list) -> tuple[str, str | None]:
+    """
+    The type (and subtype) an attribute with these values would get, as in Attribute
+    Columns mixing strings and numbers are text columns
+    """
+    types = {v.__class__ for v in values if v is not None and v != ""}
+    if not types or str in types:
+        assert types <= {str, int, float, bool}, RuntimeError(
+            "A column cannot mix texts with other values than numbers"
+        )
+        return ("text", None)
+    if types <= {int, float, bool}:
+        return ("number", "float" if float in types else None)
+    if types <= {list, set, tuple}:
+        return ("labels", None)
+    if types == {dict}:
+        return ("dict", None)
+    raise RuntimeError(
+        f"Cannot make bulk attributes of type {', '.join(map(str, types))}"
+    )
+
+
+def bulk_tokens(corpus: "Corpus", segment: "Layer", columns: dict[str, Any]) -> range:
+    """
+    Make the tokens of segment whose forms and attributes are given as columns,
+    without creating a Layer per token, and return their ids
+    The tokens are anchored in the stream right away, and the segment spans them
+    """
+    assert segment._name == corpus._segment and not segment._made, RuntimeError(
+        f"Tokens can only be made in bulk in a {corpus._segment} that is not made yet"
+    )
+    assert "form" in columns, RuntimeError("Tried to make tokens with no form")
+    token = corpus._token
+    mapping = corpus._layers[token]
+    assert mapping.anchorings == ["stream"], RuntimeError(
+        f"Tokens made in bulk can only be anchored to the stream"
+    )
+    values = {"form": column_values(columns.pop("form"))}
+    for aname, column in columns.items():
+        if aname not in mapping.attribute_names:
+            assert IS_ATTRIBUTE_NAME.match(aname), RuntimeError(
+                f"The attribute '{aname}' on the layer {token} does not match the pattern {PATTERN_TXT}"
+            )
+            mapping.attribute_names.add(aname)
+        values[aname] = column_values(column)
+    n_tokens = len(values["form"])
+    assert all(len(v) == n_tokens for v in values.values()), RuntimeError(
+        "All the columns of the tokens must have the same length"
+    )
+    # as in Layer.__setattr__, remove the linebreaks of the string values
+    for column in values.values():
+        for nt, v in enumerate(column):
+            if v.__class__ is str and ("\n" in v or "\r" in v):
+                print(
+                    f"Warning: a token attribute contains a linebreak; this is not allowed, removing the linebreaks from the value {v}."
+                )
+                column[nt] = v.replace("\n", "").replace("\r", "")
+    segment_mapping = corpus._layers[segment._name]
+    if token not in segment_mapping.contains:
+        segment_mapping.contains.append(token)
+        mapping.parents.append(segment._name)
+        corpus._layers_version += 1
+    # register the attributes as Layer.make would
+    types: dict[str, str] = {}
+    for aname, column in values.items():
+        atype = mapping.declared.get(aname)
+        subtype = None
+        if atype is None:
+            atype, subtype = column_type(column)
+        types[aname] = atype
+        mattr = mapping.attributes.get(aname)
+        if mattr is None:
+            mattr = mapping.attributes[aname] = {
+                "type": atype,
+                "nullable": mapping.counter > 0,
+            }
+        elif atype == "text" and mattr["type"] != "text":
+            mattr["type"] = "text"
+        if subtype:
+            mattr["subtype"] = subtype
+        if mattr["type"] in ATYPES_LOOKUP and aname != "meta":
+            mapping.add_lookup(corpus, aname, mattr["type"])
+        if mattr["type"] == "text":
+            column[:] = [
+                v if v is None or v.__class__ is str else str(v) for v in column
+            ]
+    anames = list(mapping.attributes)
+    cells = [values.get(aname) for aname in anames]
+    fts = corpus._fts == "inline"
+    # as in Layer.make, the lexemes are numbered after the position of the attribute
+    fts_columns = [
+        (na, values[aname])
+        for na, aname in enumerate(anames, start=1)
+        if types.get(aname) == "text"
+    ]
+    bulk_fts = segment._bulk_fts if segment._bulk_fts is not None else []
+    if n_tokens and corpus._fts == "deferred" and segment is not corpus._token_segment:
+        corpus._start_token_run(segment)
+    char_low = corpus._char_counter
+    first_id = mapping.counter + 1
+    for nt in range(n_tokens):
+        form = values["form"][nt]
+        assert form, RuntimeError("Token cannot have an empty form!")
+        mapping.counter += 1
+        low = corpus._char_counter
+        corpus._char_counter += len(form) + 1
+        row = [str(mapping.counter), segment._id, f"[{low},{corpus._char_counter})"]
+        for aname, column in zip(anames, cells):
+            aopts = mapping.attributes[aname]
+            val = column[nt] if column is not None else ""
+            if val is None or val == "":
+                aopts["nullable"] = True
+                val = ""
+            atype = aopts["type"]
+            if atype == "dict":
+                if not isinstance(val, dict):
+                    assert val == "", RuntimeError(
+                        f"The attribute '{aname}' of {token} is a dict, got {val!r}"
+                    )
+                    val = {}
+                val = {
+                    k: list(str(x) for x in v) if isinstance(v, (list, set)) else v
+                    for k, v in val.items()
+                }
+                keys = aopts.setdefault("keys", {})
+                if aname == "meta":
+                    # the special 'meta' attribute lists its sub-attributes directly
+                    keys = aopts
+                    aopts.pop("keys", None)
+                    aopts.pop("nullable", None)
+                for k, v in val.items():
+                    meta_subattr(keys, k, v)
+                val = json.dumps(sorted_dict(val))
+            if atype == "labels":
+                alookup = mapping.lookups[aname]
+                mask = 0
+                for lab in val or ():
+                    nlab = alookup.get(lab, None)
+                    if nlab is None:
+                        nlab = len(alookup)
+                        alookup[lab] = nlab
+                        mapping.csvs[aname].writerow([nlab, lab])
+                    mask |= 1 << nlab
+                aopts["nlabels"] = len(alookup)
+                val = mask
+            elif atype in ATYPES_LOOKUP and aname != "meta":
+                alookup = mapping.lookups[aname]
+                lookupid = alookup.get(val, None)
+                if lookupid is None:
+                    lookupid = len(alookup) + 1
+                    alookup[val] = lookupid
+                    mapping.csvs[aname].writerow([lookupid, val])
+                val = lookupid
+            elif val in (True, False):
+                # as in Layer.make, which also writes 0.0 and 1.0 as 0 and 1
+                val = int(val)
+            row.append(str(val))
+        mapping.write_row(row)
+        if fts:
+            bulk_fts.append(
+                " ".join(
+                    f"'{na}{esc(column[nt])}':{len(bulk_fts)+1}"
+                    for na, column in fts_columns
+                    if column[nt] not in (None, "")
+                )
+            )
+    if fts:
+        segment._bulk_fts = bulk_fts
+    if n_tokens:
+        anchors = segment._anchorings.get("stream")
+        if anchors is None:
+            segment._anchorings["stream"] = [char_low, corpus._char_counter]
+        else:
+            anchors = segment._anchorings["stream"] = [*anchors]
+            anchors[0] = min(anchors[0], char_low)
+            anchors[1] = max(anchors[1], corpus._char_counter)
+    return range(first_id, mapping.counter + 1)
+
+
+class ChildLayerMethod(partial):
+    """
+    Make a layer in a parent layer, eg. segment.Token(...)
+    Layers can be made together as with the corpus, eg. segment.DepRel.make(...)
+    Tokens can also be made in bulk: segment.Token.bulk(form=[...], lemma=[...])
+    """
+
+    def make(self, *args: "Layer") -> None:
+        """Make the layers, like the layer method of the corpus (eg. c.DepRel.make)"""
+        self.func.make(*args)  # type: ignore
 
-    def layer_method(*args, **kwargs):
+    def bulk(self, **columns) -> range:
+        corpus: Corpus = self.keywords["_parent"]._corpus
+        assert self.func is corpus._layer_methods.get(corpus._token), RuntimeError(
+            "Only tokens can be made in bulk"
+        )
+        return bulk_tokens(corpus, self.keywords["_parent"], columns)
+
+
+def get_layer_method(corpus: "Corpus", layer_name: str):
+
+    def layer_method(*args, _parent: "Layer | None" = None, **kwargs):
         if len(args) == 1 and isinstance(args[0], dict) and not kwargs:
             # global attribute
-            corpus._layers.pop(layer._name, "")
-            fname = f"{layer._name.lower()}.csv"
-            corpus._files[fname].close()
-            os.unlink(corpus._files[fname].name)
-            corpus._files.pop(fname)
-            return GlobalAttribute(corpus, layer._name, args[0])
+            if corpus._layers.pop(layer_name, None):
+                fname = f"{layer_name.lower()}.csv"
+                corpus._files[fname].close()
+                os.unlink(corpus._files[fname].name)
+                corpus._files.pop(fname)
+            return GlobalAttribute(corpus, layer_name, args[0])
+        layer = corpus._add_layer(layer_name)
+        if _parent is not None:
+            _parent.add(layer)
         largs = [a for a in args]
-        if layer._name == corpus._token and largs and isinstance(largs[0], str):
+        if layer_name == corpus._token and largs and isinstance(largs[0], str):
             form = largs.pop(0)
             layer.form = form
         if len(largs) > 0:
@@ -134,12 +453,130 @@ def get_layer_method(layer: "Layer"):
     return layer_method
 
 
+def write_layer_file(
+    source: str,
+    destination: str,
+    headers: list[str],
+    padding: dict[int, str],
+    labels: dict[int, int],
+    categorical: dict[int, dict[str, Any]],
+    rows_to_patch: int | None,
+    patch_offset: int,
+) -> None:
+    """
+    Write the final layer file from the temporary file source, then delete source
+    Only the first rows_to_patch rows are patched; the rest is copied as is
+    If rows_to_patch is None, all the rows are patched
+    """
+    with (
+        open(source, "r", encoding="utf-8", newline="") as input,
+        open(destination, "w", encoding="utf-8") as output,
+    ):
+        csv_writer = csv.writer(output)
+        csv_writer.writerow(headers)
+        rows: Iterable[list[str]] = csv.reader(input)
+        if rows_to_patch is not None:
+            rows = islice(rows, rows_to_patch)
+        for row in rows:
+            # fill in missing columns
+            for nr in range(len(row), len(headers)):
+                row.append(padding[nr])
+            # optimize each column that needs to be optimized
+            for nc, val in enumerate(row):
+                if nc in labels:
+                    # label sets are stored as integer bitmasks during the build
+                    row[nc] = format(int(val or 0), f"0{labels[nc]}b")
+                if nc in categorical:
+                    row[nc] = categorical[nc][val]
+            csv_writer.writerow(row)
+        if rows_to_patch is not None:
+            # the remaining rows are final: copy them as they are
+            output.flush()
+            with open(source, "rb") as tail:
+                tail.seek(patch_offset)
+                shutil.copyfileobj(tail, output.buffer, COPY_BUFSIZE)
+    os.remove(source)
+
+
+def read_lines(path: str, start: int, end: int) -> Iterator[str]:
+    """
+    Yield the lines of the file at path between the bytes start and end
+    """
+    with open(path, "rb") as input:
+        input.seek(start)
+        while start < end:
+            line = input.readline()
+            if not line:
+                break
+            start += len(line)
+            yield line.decode("utf-8")
+
+
+def write_fts_vectors(
+    source: str,
+    destination: str,
+    start: int,
+    end: int,
+    lookups: dict[int, tuple[int, str]],
+) -> None:
+    """
+    Write the FTS vectors of the segments whose tokens are between the bytes start
+    and end of the token file source. lookups maps the column indices of the text
+    attributes to their position in the vectors and the path of their lookup file,
+    from which only the values of the tokens in this chunk are read
+    """
+    ids: dict[int, set[str]] = {nc: set() for nc in lookups}
+    for row in csv.reader(read_lines(source, start, end)):
+        for nc, nc_ids in ids.items():
+            if nc < len(row):
+                nc_ids.add(row[nc])
+    # the lexemes of the non-empty values, minus the position of the token
+    columns: dict[int, dict[str, str]] = {}
+    for nc, (na, path) in lookups.items():
+        lexemes = columns[nc] = {}
+        nc_ids = ids[nc]
+        with open(path, "r", encoding="utf-8", newline="") as lookup_file:
+            lookup_rows = csv.reader(lookup_file)
+            next(lookup_rows, None)  # headers
+            for lid, value in lookup_rows:
+                if value and lid in nc_ids:
+                    lexemes[lid] = f"'{na}{esc(value)}':"
+    with open(destination, "w", encoding="utf-8", newline="") as output:
+        csv_writer = csv.writer(output)
+        segment_id = None
+        fts: list[str] = []
+        for row in csv.reader(read_lines(source, start, end)):
+            if row[1] != segment_id:
+                if fts:
+                    csv_writer.writerow([segment_id, " ".join(fts)])
+                segment_id = row[1]
+                fts = []
+            nt = str(len(fts) + 1)
+            tlexemes = []
+            for nc, lexemes_by_id in columns.items():
+                if nc >= len(row):
+                    continue
+                lexeme = lexemes_by_id.get(row[nc])
+                if lexeme is not None:
+                    tlexemes.append(lexeme + nt)
+            fts.append(" ".join(tlexemes))
+        if fts:
+            csv_writer.writerow([segment_id, " ".join(fts)])
+
+
 class LayerMapping:
-    def __init__(self, layer: "Layer"):
-        corpus = layer._corpus
-        lname = layer._name.lower()
+    def __init__(self, corpus: "Corpus", layer_name: str):
+        lname = layer_name.lower()
+        self.name = layer_name
         self.csvs: dict[str, Any] = {"_main": corpus._csv_writer(f"{lname}.csv")}
-        if layer._name == corpus._segment:
+        self.main_file = corpus._files[f"{lname}.csv"]
+        # rows before rows_to_patch (at byte patch_offset) are narrower than
+        # the last row written and will need to be padded in Corpus.make
+        self.row_width: int = -1
+        self.min_row_width: int = -1
+        self.rows_to_patch: int = 0
+        self.patch_offset: int = 0
+        if layer_name == corpus._segment and corpus._fts != "none":
             self.csvs["_fts"] = corpus._csv_writer(f"fts_vector.csv")
             self.csvs["_fts"].writerow([f"{lname}_id", "vector"])
         self.attributes: dict[str, Any] = {}
@@ -147,10 +584,49 @@ class LayerMapping:
         self.counter = 0
         self.nested_set_counter: int = 1
         self.contains: list[str] = []
+        self.parents: list[str] = []
         self.anchorings: list[str] = []
-        if layer._name in (corpus._token, corpus._segment):
+        # value of Corpus._layers_version when the layer was last found off-stream
+        self.not_in_stream: int = -1
+        if layer_name in (corpus._token, corpus._segment):
             self.anchorings.append("stream")
         self.media: None | dict = None
+        # attribute names already checked against IS_ATTRIBUTE_NAME
+        self.attribute_names: set[str] = set()
+        # types of the attributes declared in the schema of the corpus
+        self.declared: dict[str, str] = {}
+        for aname, aopts in corpus._schema.get(layer_name, {}).items():
+            self.attributes[aname] = json.loads(json.dumps(aopts))
+            self.declared[aname] = aopts["type"]
+            self.attribute_names.add(aname)
+            if aopts["type"] in ATYPES_LOOKUP and aname != "meta":
+                self.add_lookup(corpus, aname, aopts["type"])
+
+    def add_lookup(self, corpus: "Corpus", aname: str, atype: str) -> None:
+        """
+        Create the lookup and the lookup file of the attribute aname if needed
+        """
+        if aname not in self.lookups:
+            self.lookups[aname] = corpus._spill_store.lookup()
+        if aname not in self.csvs:
+            fn = f"{self.name.lower()}_{aname.lower()}.csv"
+            self.csvs[aname] = corpus._csv_writer(fn)
+            if atype == "labels":
+                self.csvs[aname].writerow(["bit", "label"])
+            else:
+                self.csvs[aname].writerow([f"{aname}_id", aname])
+
+    def write_row(self, row: list) -> None:
+        """
+        Write a row of the main file, keeping track of the narrower rows
+        """
+        if len(row) != self.row_width:
+            if self.min_row_width < 0 or len(row) < self.min_row_width:
+                self.min_row_width = len(row)
+            self.row_width = len(row)
+            self.rows_to_patch = self.counter - 1
+            self.patch_offset = self.main_file.tell()
+        self.csvs["_main"].writerow(row)
 
 
 class Corpus:
@@ -167,7 +643,19 @@ class Corpus:
         revision: int | float = 1,
         url: str = "placeholder",
         license: str | None = None,
+        max_lookup_bytes: int = DEFAULT_SPILL_BYTES,
+        fts: str = "inline",
+        schema: dict | None = None,
+        debug: bool = False,
     ):
+        """
+        schema is the "layer" part of a config.json (or a whole config.json, eg. from
+        a previous run): the attributes it declares are not inferred from the values,
+        and their values are only checked against the declared types if debug is True
+        """
+        assert fts in FTS_MODES, RuntimeError(
+            f"Invalid FTS mode '{fts}' (must be one of {', '.join(FTS_MODES)})"
+        )
         self._name = name
         self._document = document
         self._segment = segment
@@ -184,6 +672,29 @@ class Corpus:
         self._url = url
         self._license = license
         self._upperFrameDocument = 0
+        # frames used so far by the merged shards and the time-anchored converters
+        self._frame_counter = 0
+        self._fts = fts
+        # the segment of the last token made, see _start_token_run
+        self._token_segment: Layer | None = None
+        # lookups are kept in memory up to max_lookup_bytes, then spill to disk
+        self._spill_store = SpillStore(max_lookup_bytes)
+        self._layer_methods: dict[str, Any] = {}
+        # incremented whenever a layer type gets a new child type or anchoring
+        self._layers_version: int = 0
+        self._schema: dict[str, dict[str, dict]] = declared_attributes(schema or {})
+        self._debug = debug
+
+    def _start_token_run(self, segment: "Layer") -> None:
+        """
+        Deferred FTS vectors are read from the token file, in which the tokens
+        of each segment must follow each other
+        """
+        assert not segment._tokens_started, RuntimeError(
+            f"Some tokens of the segment {segment._id} were made after the tokens of another segment: make the tokens of each segment together, or use fts='inline'"
+        )
+        segment._tokens_started = True
+        self._token_segment = segment
 
     def _csv_writer(self, fn: str):
         tmp = tempfile.NamedTemporaryFile(
@@ -192,32 +703,377 @@ class Corpus:
         self._files[fn] = tmp
         return csv.writer(tmp)
 
+    def _register_layer(self, layer_name: str):
+        if layer_name not in self._layers:
+            self._layers[layer_name] = LayerMapping(self, layer_name)
+
+    def _global_attribute_mapping(self, name: str) -> dict:
+        if name not in self._global_attributes:
+            lname = name.lower()
+            csv_writer = self._csv_writer(f"global_attribute_{lname}.csv")
+            csv_writer.writerow([f"{lname}_id", lname])
+            self._global_attributes[name] = {"csv": csv_writer, "ids": {}, "keys": {}}
+        return self._global_attributes[name]
+
     def _add_layer(self, layer_name: str):
         layer: Layer = Layer(layer_name, self)
-        if layer._name not in self._layers:
-            layer_mapping = LayerMapping(layer)
-            self._layers[layer._name] = layer_mapping
+        self._register_layer(layer_name)
         if layer_name == self._segment:
             layer._id = str(uuid4())
         return layer
 
+    def _type_in_stream(self, layer_name: str, checked: set[str]) -> bool:
+        """
+        Return True if the layer type should be anchored to the stream,
+        ie. if one of the types it appears next to is stream-anchored
+        """
+        mapping = self._layers[layer_name]
+        if "stream" in mapping.anchorings:
+            return True
+        now_checked: set[str] = checked.union({layer_name})
+        for parent_name in mapping.parents:
+            if any(
+                self._type_in_stream(sibling, now_checked)
+                for sibling in self._layers[parent_name].contains
+                if sibling not in now_checked
+            ):
+                mapping.anchorings.append("stream")
+                self._layers_version += 1
+                return True
+        return False
+
     def __setattr__(self, name: str, value: Any):
-        if name.startswith("_"):
+        if name[0] == "_":
             super().__setattr__(name, value)
         # elif name in ("document", "segment", "token"):
         else:
             setattr(self, f"_{name}", value)
 
-    def __getattribute__(self, name: str):
+    def __getattr__(self, name: str):
+        # only called for names that are not actual attributes of the instance
         if name in ("document", "segment", "token"):
             return getattr(self, f"_{name}")
-        elif re.match(r"[A-Z]", name):
-            layer = self._add_layer(name)
-            return get_layer_method(layer)
-        return super().__getattribute__(name)
+        elif "A" <= name[:1] <= "Z":
+            return self._get_layer_method(name)
+        raise AttributeError(f"'Corpus' object has no attribute '{name}'")
+
+    def _get_layer_method(self, name: str):
+        # register the layer upon access to preserve the order of the layers
+        self._register_layer(name)
+        layer_method = self._layer_methods.get(name)
+        if layer_method is None:
+            layer_method = get_layer_method(self, name)
+            self._layer_methods[name] = layer_method
+        return layer_method
 
-    def make(self, destination: str = "./", is_global: dict = {}):
+    def _make_fts_vectors(self, workers: int = 1) -> None:
+        """
+        Generate the FTS vectors of all the segments from the token file, in chunks
+        The tokens of each segment were made together (see _start_token_run), and
+        the attributes are numbered after their position in the token layer, as inline
+        """
+        mapping = self._layers[self._token]
+        mapping.main_file.flush()
+        path = mapping.main_file.name
+        size = os.path.getsize(path)
+        # token rows: token_id, segment_id, anchors, attributes
+        first_attr = 2 + len(mapping.anchorings)
+        # the workers read the values from the lookup files, not from memory
+        lookups: dict[int, tuple[int, str]] = {}
+        for na, (aname, aopts) in enumerate(mapping.attributes.items()):
+            if aopts["type"] != "text":
+                continue
+            lookup_file = self._files[f"{self._token.lower()}_{aname.lower()}.csv"]
+            lookup_file.flush()
+            lookups[first_attr + na] = (na + 1, lookup_file.name)
+        # split the file at segment boundaries
+        n_chunks = max(workers, -(-size // FTS_CHUNK_SIZE))
+        offsets = [0]
+        with open(path, "rb") as input:
+            for nw in range(1, n_chunks):
+                input.seek(max(offsets[-1], size * nw // n_chunks))
+                if input.tell() > 0:
+                    input.readline()  # skip to the start of a line
+                segment_id = None
+                while line := input.readline():
+                    line_segment_id = line.split(b",", 2)[1]
+                    if segment_id is not None and line_segment_id != segment_id:
+                        break
+                    segment_id = line_segment_id
+                offsets.append(input.tell() - len(line) if line else size)
+        offsets.append(size)
+        chunks = [
+            (path, f"{path}.fts{nc}", start, end, lookups)
+            for nc, (start, end) in enumerate(zip(offsets, offsets[1:]))
+            if end > start
+        ]
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for _ in executor.map(write_fts_vectors, *zip(*chunks)):
+                    pass
+        else:
+            for chunk in chunks:
+                write_fts_vectors(*chunk)
+        fts_file = self._files["fts_vector.csv"]
+        for _, chunk_path, *_ in chunks:
+            with open(chunk_path, "r", encoding="utf-8", newline="") as chunk_file:
+                shutil.copyfileobj(chunk_file, fts_file, COPY_BUFSIZE)
+            os.remove(chunk_path)
+
+    def _save_shard(self, folder: str) -> None:
+        """
+        Move the temporary files to folder, along with the state needed to merge them
+        """
+        for fn, f in self._files.items():
+            f.close()
+            move_file(f.name, os.path.join(folder, fn))
+        self._files = {}
+        state = {
+            "char_counter": self._char_counter,
+            "upper_frame_document": self._upperFrameDocument,
+            "global_attributes": {
+                name: mapping["keys"]
+                for name, mapping in self._global_attributes.items()
+            },
+            "layers": {
+                layer_name: {
+                    "attributes": mapping.attributes,
+                    "anchorings": mapping.anchorings,
+                    "contains": mapping.contains,
+                    "parents": mapping.parents,
+                    "counter": mapping.counter,
+                    "nested_set_counter": mapping.nested_set_counter,
+                    "media": mapping.media,
+                }
+                for layer_name, mapping in self._layers.items()
+            },
+        }
+        with open(os.path.join(folder, SHARD_STATE), "w") as state_file:
+            json.dump(state, state_file)
+        self._spill_store.close()
+
+    def _merge_shard(self, folder: str, keep: bool = False) -> None:
+        """
+        Append the shard saved in folder to this corpus, then delete folder unless keep
+        The ids, anchors and nested sets of the shard are offset and its lookup ids
+        are renumbered, as if its layers had been made by this corpus
+        """
+        with open(os.path.join(folder, SHARD_STATE), "r") as state_file:
+            state = json.load(state_file)
+
+        def read_rows(fn: str, headers: bool = True) -> Iterator[list[str]]:
+            with open(os.path.join(folder, fn), "r", encoding="utf-8", newline="") as f:
+                rows = csv.reader(f)
+                if headers:
+                    next(rows, None)
+                yield from rows
+
+        char_offset = self._char_counter
+        frame_offset = self._frame_counter
+        time_documents = 0
+        # the tokens of the shard come after those made so far
+        self._token_segment = None
+        id_offsets = {name: mapping.counter for name, mapping in self._layers.items()}
+        global_ids: dict[str, dict[str, str]] = {}
+        for name, keys in state["global_attributes"].items():
+            gmapping = self._global_attribute_mapping(name)
+            merge_subattrs(gmapping["keys"], keys)
+            shard_ids = global_ids[name.lower()] = {}
+            for gid, value in read_rows(f"global_attribute_{name.lower()}.csv"):
+                new_gid = gid
+                if "id" not in json.loads(value):
+                    new_gid = str(len(gmapping["ids"]) + 1)
+                shard_ids[gid] = new_gid
+                gmapping["ids"][new_gid] = 1
+                gmapping["csv"].writerow([new_gid, value])
+        for layer_name, layer_state in state["layers"].items():
+            self._register_layer(layer_name)
+            mapping = self._layers[layer_name]
+            lname = layer_name.lower()
+            for a in layer_state["anchorings"]:
+                if a not in mapping.anchorings:
+                    mapping.anchorings.append(a)
+            for c in layer_state["contains"]:
+                if c not in mapping.contains:
+                    mapping.contains.append(c)
+            for p in layer_state["parents"]:
+                if p not in mapping.parents:
+                    mapping.parents.append(p)
+            if layer_state["media"]:
+                mapping.media = {**(mapping.media or {}), **layer_state["media"]}
+            shard_attributes: dict[str, dict] = layer_state["attributes"]
+            for aname, mattr in mapping.attributes.items():
+                if aname not in shard_attributes and layer_state["counter"]:
+                    mattr["nullable"] = True
+
+            def lookup_id(aname: str, value: str) -> str:
+                lookup = mapping.lookups[aname]
+                lookupid = lookup.get(value, None)
+                if lookupid is None:
+                    lookupid = len(lookup) + 1
+                    lookup[value] = lookupid
+                    mapping.csvs[aname].writerow([lookupid, value])
+                return str(lookupid)
+
+            def missing_value(aname: str) -> str:
+                # the value a row gets when the instance does not have the attribute
+                mapping.attributes[aname]["nullable"] = True
+                atype = mapping.attributes[aname]["type"]
+                if atype == "labels":
+                    return "0"
+                if atype not in ("text", "dict") or aname == "meta":
+                    return ""
+                return lookup_id(aname, "" if atype == "text" else json.dumps({}))
+
+            # how to convert the cells of each attribute
+            converters: dict[str, Callable[[str], str]] = {}
+            for aname, aopts in shard_attributes.items():
+                atype = aopts["type"]
+                mattr = mapping.attributes.get(aname)
+                if mattr is None:
+                    mattr = mapping.attributes[aname] = aopts
+                    if mapping.counter:
+                        mattr["nullable"] = True
+                else:
+                    if mattr["type"] == "number" and atype == "text":
+                        # as in Layer.make, text values take over numbers
+                        mattr["type"] = "text"
+                    assert mattr["type"] == atype or (
+                        mattr["type"] == "text" and atype == "number"
+                    ), RuntimeError(
+                        f"The attribute '{aname}' of {layer_name} is of type {mattr['type']} in a shard and of type {atype} in another"
+                    )
+                    if aopts.get("nullable"):
+                        mattr["nullable"] = True
+                    if "subtype" in aopts:
+                        mattr["subtype"] = aopts["subtype"]
+                    if "keys" in aopts:
+                        merge_subattrs(mattr.setdefault("keys", {}), aopts["keys"])
+                    if aname == "meta":
+                        merge_subattrs(mattr, aopts)
+                if atype == "number" and mattr["type"] == "text":
+                    converters[aname] = partial(lookup_id, aname)
+                elif atype == "ref":
+                    ids = global_ids.get(aopts["ref"], {})
+                    converters[aname] = partial(renumber_id, ids)
+                elif atype == "entity":
+                    if aopts["entity"] != self._segment:
+                        offset = id_offsets.get(aopts["entity"], 0)
+                        converters[aname] = partial(offset_id, offset)
+                elif atype in ATYPES_LOOKUP and aname != "meta":
+                    mapping.add_lookup(self, aname, atype)
+                    lookup = mapping.lookups[aname]
+                    new_ids: dict[str, str] = {}
+                    for lid, value in read_rows(f"{lname}_{aname.lower()}.csv"):
+                        if atype == "labels":
+                            new_lid = lookup.get(value, None)
+                            if new_lid is None:
+                                new_lid = len(lookup)
+                                lookup[value] = new_lid
+                                mapping.csvs[aname].writerow([new_lid, value])
+                            new_ids[lid] = str(new_lid)
+                        else:
+                            new_ids[lid] = lookup_id(aname, value)
+                    if atype == "labels":
+                        mattr["nlabels"] = len(lookup)
+                    if all(lid == new_lid for lid, new_lid in new_ids.items()):
+                        continue
+                    if atype == "labels":
+                        bits = {int(b): int(nb) for b, nb in new_ids.items()}
+                        converters[aname] = partial(remap_label_bits, bits)
+                    else:
+                        converters[aname] = partial(renumber_id, new_ids)
+
+            anames = list(mapping.attributes)
+            shard_anames = list(shard_attributes)
+            # position of each attribute of the layer in the rows of the shard
+            attr_indices = [
+                shard_anames.index(an) if an in shard_attributes else None
+                for an in anames
+            ]
+            is_relation = any(a["type"] == "entity" for a in shard_attributes.values())
+            n_nested = 2 if layer_state["nested_set_counter"] > 1 else 0
+            n_fixed = 1 + (2 if layer_state["media"] else 0)
+            if layer_name == self._token:
+                n_fixed += 1
+            shard_anchors = [a for a in ANCHORINGS if a in layer_state["anchorings"]]
+            anchor_indices = [
+                shard_anchors.index(a) if a in shard_anchors else None
+                for a in ANCHORINGS
+                if a in mapping.anchorings
+            ]
+            is_document = layer_name == self._document
+            id_offset = id_offsets.get(layer_name, 0)
+            nested_offset = mapping.nested_set_counter - 1
+            # the headers of the layer files are only written by Corpus.make
+            for row in read_rows(f"{lname}.csv", headers=False):
+                if is_relation:
+                    new_row = [str(int(v) + nested_offset) for v in row[:n_nested]]
+                    cells = row[n_nested:]
+                else:
+                    new_row = row[:n_fixed]
+                    if layer_name != self._segment:
+                        new_row[0] = str(int(row[0]) + id_offset)
+                    anchors = row[n_fixed : n_fixed + len(shard_anchors)]
+                    cells = row[n_fixed + len(shard_anchors) :]
+                    for anc_name, na in zip(ANCHORINGS, anchor_indices):
+                        if na is None:
+                            new_row.append("")
+                            continue
+                        anchor = anchors[na]
+                        if anc_name == "stream":
+                            low, high = (int(x) for x in anchor[1:-1].split(","))
+                            anchor = f"[{low+char_offset},{high+char_offset})"
+                        elif anc_name == "time":
+                            low, high = (int(x) for x in anchor[1:-1].split(","))
+                            low, high = (low + frame_offset, high + frame_offset)
+                            if is_document and not time_documents:
+                                # see Layer._aggregate_document_time
+                                low = min(low, self._upperFrameDocument)
+                            time_documents += is_document
+                            self._frame_counter = max(self._frame_counter, high)
+                            anchor = f"[{low},{high})"
+                        new_row.append(anchor)
+                attr_cells: list[str] = []
+                n_missing = 0
+                for aname, na in zip(anames, attr_indices):
+                    if na is None or na >= len(cells):
+                        n_missing += 1
+                        continue
+                    # fill in the attributes missing before this one
+                    for missing_aname in anames[
+                        len(attr_cells) : len(attr_cells) + n_missing
+                    ]:
+                        attr_cells.append(missing_value(missing_aname))
+                    n_missing = 0
+                    value = cells[na]
+                    converter = converters.get(aname)
+                    attr_cells.append(converter(value) if converter else value)
+                mapping.counter += 1
+                mapping.write_row(new_row + attr_cells)
+            mapping.nested_set_counter += layer_state["nested_set_counter"] - 1
+        fts_path = os.path.join(folder, "fts_vector.csv")
+        if self._fts == "inline" and os.path.exists(fts_path):
+            with open(fts_path, "r", encoding="utf-8", newline="") as fts_file:
+                fts_file.readline()  # headers
+                shutil.copyfileobj(
+                    fts_file, self._files["fts_vector.csv"], COPY_BUFSIZE
+                )
+        self._char_counter += state["char_counter"]
+        if time_documents:
+            self._upperFrameDocument = frame_offset + state["upper_frame_document"]
+        if not keep:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def make(self, destination: str = "./", is_global: dict = {}, workers: int = 1):
+        """
+        Write the final files and the configuration to destination
+        workers > 1 writes the layer files in parallel processes
+        """
+        if self._fts == "deferred":
+            self._make_fts_vectors(workers)
         # second pass + write final files
+        layer_files: list[tuple] = []
         for layer_name, mapping in self._layers.items():
             lname = layer_name.lower()
             headers = [f"{lname}_id"]
@@ -246,6 +1102,8 @@ class Corpus:
             header_n_to_attr: dict[int, str] = {}
             labels: dict[int, int] = {}
             texts_to_categorical: dict[int, str] = {}
+            # lookup id (as written in the temp file) -> categorical value
+            categorical_values: dict[str, dict[str, Any]] = {}
             for na, (aname, aopts) in enumerate(
                 mapping.attributes.items(), start=len(headers)
             ):
@@ -262,6 +1120,9 @@ class Corpus:
                     )
                     if can_categorize:
                         texts_to_categorical[na] = aname
+                        categorical_values[aname] = {
+                            str(v): k for k, v in lookup.items()
+                        }
                         headers.append(aname)
                     else:
                         headers.append(f"{aname}_id")
@@ -273,44 +1134,48 @@ class Corpus:
                 else:
                     headers.append(aname)
                 header_n_to_attr[na] = aname
+            # resolve the lookup ids of the empty values used to pad short rows
+            padding: dict[int, str] = {}
+            min_width = mapping.min_row_width if mapping.counter else len(headers)
+            for nr in range(min_width, len(headers)):
+                aname = header_n_to_attr[nr]
+                aopts = mapping.attributes[aname]
+                if aopts["type"] not in ("text", "dict"):
+                    padding[nr] = ""
+                    continue
+                lookup = mapping.lookups[aname]
+                lookupval: Any = "" if aopts["type"] == "text" else json.dumps(dict({}))
+                lookupid: int | None = lookup.get(lookupval, None)
+                if lookupid is None:
+                    lookupid = len(lookup) + 1
+                    lookup[lookupval] = lookupid
+                    mapping.csvs[aname].writerow([lookupid, lookupval])
+                    if aname in categorical_values:
+                        categorical_values[aname][str(lookupid)] = lookupval
+                padding[nr] = str(lookupid)
             lfn = f"{lname}.csv"
-            ifile = self._files[lfn]
-            ifile.seek(0)
-            with open(os.path.join(destination, lfn), "w") as output:
-                csv_writer = csv.writer(output)
-                csv_writer.writerow(headers)
-                for row in csv.reader(ifile):
-                    # fill in missing columns
-                    for nr in range(len(row), len(headers)):
-                        aname = header_n_to_attr[nr]
-                        aopts = mapping.attributes[aname]
-                        if aopts["type"] not in ("text", "dict"):
-                            row.append("")
-                            continue
-                        lookup = mapping.lookups[aname]
-                        lookupval: Any = (
-                            "" if aopts["type"] == "text" else json.dumps(dict({}))
-                        )
-                        lookupid: int | None = lookup.get(lookupval, None)
-                        if lookupid is None:
-                            lookupid = len(lookup) + 1
-                            lookup[lookupval] = lookupid
-                            mapping.csvs[aname].writerow([lookupid, lookupval])
-                        row.append(str(lookupid))
-                    # optimize each column that needs to be optimized
-                    for nc, val in enumerate(row):
-                        if nc in labels:
-                            while len(val) < labels[nc]:
-                                val = f"0{val}"
-                            row[nc] = val
-                        if nc in texts_to_categorical:
-                            aname = texts_to_categorical[nc]
-                            row[nc] = next(
-                                k
-                                for k, v in mapping.lookups[aname].items()
-                                if str(v) == val
-                            )
-                    csv_writer.writerow(row)
+            ifile = self._files.pop(lfn)
+            ifile.close()
+            # only the rows written before the last width change need to be
+            # parsed and patched, unless some columns need to be rewritten
+            rewrite_all = bool(labels or texts_to_categorical) or (
+                mapping.row_width != len(headers)
+            )
+            layer_files.append(
+                (
+                    ifile.name,
+                    os.path.join(destination, lfn),
+                    headers,
+                    padding,
+                    labels,
+                    {
+                        na: categorical_values[an]
+                        for na, an in texts_to_categorical.items()
+                    },
+                    None if rewrite_all else mapping.rows_to_patch,
+                    mapping.patch_offset,
+                )
+            )
             for aname in texts_to_categorical.values():
                 mapping.attributes[aname]["type"] = "categorical"
                 afn = f"{lname}_{aname.lower()}.csv"
@@ -321,16 +1186,19 @@ class Corpus:
                 print(
                     f"Turned {layer_name}->{aname} from text to categorical; delete lookup file"
                 )
-            tmp_path = ifile.name
-            ifile.close()
-            os.remove(tmp_path)
-            self._files.pop(lfn, "")
+        # start with the biggest files so they do not hold back the rest
+        layer_files.sort(key=lambda lf: -os.path.getsize(lf[0]))
+        if workers > 1 and len(layer_files) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for _ in executor.map(write_layer_file, *zip(*layer_files)):
+                    pass
+        else:
+            for layer_file in layer_files:
+                write_layer_file(*layer_file)
         # remaining files
         for fn, f in self._files.items():
-            tmp_path = f.name
             f.close()
-            shutil.copy(tmp_path, os.path.join(destination, fn))
-            os.remove(tmp_path)
+            move_file(f.name, os.path.join(destination, fn))
         config: dict[str, Any] = {
             "meta": {
                 "name": self._name,
@@ -386,9 +1254,12 @@ class Corpus:
                 if ais_global:
                     aopts["isGlobal"] = True
                 if aopts["type"] == "categorical" and not ais_global:
+                    # list the values in order of appearance (ie. of lookup id)
                     aopts["values"] = [
                         str(v)
-                        for v in mapping.lookups[aname]
+                        for v, _ in sorted(
+                            mapping.lookups[aname].items(), key=lambda x: x[1]
+                        )
                         if v is not None and v != ""
                     ]
                 elif aopts["type"] == "ref":
@@ -412,9 +1283,25 @@ class Corpus:
             config["layer"][layer] = toconf
         with open(os.path.join(destination, "config.json"), "w") as config_output:
             config_output.write(json.dumps(config, indent=4))
+        self._spill_store.close()
 
 
 class Layer:
+    __slots__ = (
+        "_name",
+        "_attributes",
+        "_corpus",
+        "_anchorings",
+        "_contains",
+        "_parents",
+        "_id",
+        "_made",
+        "_media",
+        "_nested_set",
+        "_bulk_fts",
+        "_tokens_started",
+    )
+
     def __init__(self, name: str, corpus: Corpus):
         self._name = name
         self._attributes: dict[str, Attribute] = {}
@@ -426,14 +1313,22 @@ class Layer:
         self._made: bool = False
         self._media: dict | None = None
         self._nested_set: list = []
+        # FTS vectors of the tokens made in bulk in this segment
+        self._bulk_fts: list[str] | None = None
+        # whether tokens of this segment were made, with deferred FTS vectors
+        self._tokens_started: bool = False
 
     def __setattr__(self, name: str, value: Any):
-        if name.startswith("_"):
+        if name[0] == "_":
             super().__setattr__(name, value)
         else:
-            assert re.match(r"[a-z][a-zA-Z0-9_]+$", name), RuntimeError(
-                f"The attribute '{name}' on the layer {self._name} does not match the pattern {PATTERN_TXT}"
-            )
+            mapping = self._corpus._layers[self._name]
+            attribute_names = mapping.attribute_names
+            if name not in attribute_names:
+                assert IS_ATTRIBUTE_NAME.match(name), RuntimeError(
+                    f"The attribute '{name}' on the layer {self._name} does not match the pattern {PATTERN_TXT}"
+                )
+                attribute_names.add(name)
             # Disallow linebreak in token string values because it messes with CSV's (in particular, FTS)
             if (
                 self._name == self._corpus._token
@@ -444,15 +1339,13 @@ class Layer:
                     f"Warning: a token attribute contains a linebreak; this is not allowed, removing the linebreaks from the value {value}."
                 )
                 value = value.replace("\n", "").replace("\r", "")
-            Attribute(self, name, value)
+            Attribute(self, name, value, mapping.declared.get(name))
 
-    def __getattribute__(self, name: str):
-        if re.match(r"[A-Z]", name):
-            corpus = self._corpus
-            layer = corpus._add_layer(name)
-            self.add(layer)
-            return get_layer_method(layer)
-        return super().__getattribute__(name)
+    def __getattr__(self, name: str):
+        # only called for names that are not actual attributes of the instance
+        if "A" <= name[:1] <= "Z":
+            return ChildLayerMethod(self._corpus._get_layer_method(name), _parent=self)
+        raise AttributeError(f"'Layer' object has no attribute '{name}'")
 
     def _find_in_parents(self, parent_name: str):
         if not self._parents:
@@ -466,23 +1359,21 @@ class Layer:
                 return parent
         return None
 
-    def _in_stream(self, checked: set[str] = set()) -> bool:
+    def _in_stream(self) -> bool:
         """
         Return True if this layer should be anchored to the stream
         In particular, if the previous sibling is stream-anchored
         """
-        self_a = self._corpus._layers[self._name].anchorings
-        if "stream" in self_a:
+        corpus = self._corpus
+        mapping = corpus._layers[self._name]
+        if "stream" in mapping.anchorings:
             return True
-        now_checked: set[str] = checked.union({self._name})
-        for p in self._parents:
-            if any(
-                l._in_stream(checked=now_checked)
-                for l in p._contains
-                if l._name not in now_checked
-            ):
-                self_a.append("stream")
-                return True
+        # negative decisions hold until the structure of the layers changes
+        if mapping.not_in_stream == corpus._layers_version:
+            return False
+        if corpus._type_in_stream(self._name, set()):
+            return True
+        mapping.not_in_stream = corpus._layers_version
         return False
 
     def _children(self, recursive: bool = False) -> list["Layer"]:
@@ -496,37 +1387,58 @@ class Layer:
             ch.append(c)
         return ch
 
-    def _update_parents_anchors(self):
-        """Update the anchors of all the parents (recursively)"""
-        if not self._made:
-            return
+    def _aggregate_anchors(self):
+        """Widen the anchors of this layer to cover those of its children"""
+        is_document = self._name == self._corpus._document
+        anchorings = self._anchorings
+        for child in self._contains:
+            for anc_name, anchors in child._anchorings.items():
+                if is_document and anc_name == "time":
+                    continue
+                own_anchors = anchorings.get(anc_name)
+                if own_anchors is None:
+                    anchorings[anc_name] = [*anchors]
+                    continue
+                if not isinstance(own_anchors, list):
+                    own_anchors = anchorings[anc_name] = [*own_anchors]
+                if anchors[0] < own_anchors[0]:
+                    own_anchors[0] = anchors[0]
+                if anc_name != "location":
+                    if anchors[1] > own_anchors[1]:
+                        own_anchors[1] = anchors[1]
+                    continue
+                if anchors[1] < own_anchors[1]:
+                    own_anchors[1] = anchors[1]
+                if anchors[2] > own_anchors[2]:
+                    own_anchors[2] = anchors[2]
+                if anchors[3] > own_anchors[3]:
+                    own_anchors[3] = anchors[3]
+        if is_document:
+            self._aggregate_document_time()
+
+    def _aggregate_document_time(self):
+        """
+        Widen the time of this document to cover its children, and pull its lower
+        bound back to the upper frame of the previous document, so there is no gap
+        """
         corpus = self._corpus
-        parents = self._parents
-        while parents:
-            current_parents = [*parents]
-            parents = []
-            for parent in current_parents:
-                parents += parent._parents
-                for anc_name, anchors in self._anchorings.items():
-                    if anc_name not in parent._anchorings:
-                        parent._anchorings[anc_name] = [*anchors]
-                    parent_anchors = parent._anchorings[anc_name]
-                    if anchors[0] < parent_anchors[0]:
-                        parent_anchors[0] = anchors[0]
-                    if anc_name == "time" and parent._name == corpus._document:
-                        if corpus._upperFrameDocument < parent_anchors[0]:
-                            parent_anchors[0] = corpus._upperFrameDocument
-                        corpus._upperFrameDocument = parent_anchors[1]
-                    if anc_name != "location":
-                        if anchors[1] > parent_anchors[1]:
-                            parent_anchors[1] = anchors[1]
-                        continue
-                    if anchors[1] < parent_anchors[1]:
-                        parent_anchors[1] = anchors[1]
-                    if anchors[2] > parent_anchors[2]:
-                        parent_anchors[2] = anchors[2]
-                    if anchors[3] > parent_anchors[3]:
-                        parent_anchors[3] = anchors[3]
+        times = [
+            child._anchorings["time"]
+            for child in self._contains
+            if "time" in child._anchorings
+        ]
+        if not times:
+            return
+        own_anchors = [*self._anchorings.get("time", times[0])]
+        for anchors in times:
+            if anchors[0] < own_anchors[0]:
+                own_anchors[0] = anchors[0]
+            if anchors[1] > own_anchors[1]:
+                own_anchors[1] = anchors[1]
+        if corpus._upperFrameDocument < own_anchors[0]:
+            own_anchors[0] = corpus._upperFrameDocument
+        corpus._upperFrameDocument = own_anchors[1]
+        self._anchorings["time"] = own_anchors
 
     def clear(self):
         if not self._made:
@@ -535,6 +1447,7 @@ class Layer:
         self._parents = []
         self._contains = []
         self._attributes = {}
+        self._bulk_fts = None
 
     def make(self, clear=False):
         if self._made:
@@ -564,27 +1477,36 @@ class Layer:
             )
             seg_parent = self._find_in_parents(corpus._segment)
             rows.append(seg_parent._id)
+            if corpus._fts == "deferred" and seg_parent is not corpus._token_segment:
+                corpus._start_token_run(seg_parent)
             char_low = corpus._char_counter
             corpus._char_counter = (
                 corpus._char_counter + len(self._attributes["form"]._value) + 1
             )
             self._anchorings["stream"] = [char_low, corpus._char_counter]
-        elif self._contains:
+        elif self._contains or self._bulk_fts:
             for child in self._contains:
                 child.make()
-            if is_segment:
+            self._aggregate_anchors()
+            if is_segment and corpus._fts == "inline":
                 tokens = [
-                    ch._attributes.values()
+                    ch._attributes
                     for ch in self._children(recursive=True)
                     if ch._name == corpus._token
                 ]
-                fts = [
+                # the lexemes follow the order of the attributes in the token layer,
+                # whatever the order in which each token set them
+                anames = list(corpus._layers[corpus._token].attributes)
+                bulk_fts = self._bulk_fts or []
+                fts = bulk_fts + [
                     " ".join(
-                        f"'{na+1}{esc(attr._value)}':{nt+1}"
-                        for na, attr in enumerate(attrs)
-                        if attr._type in ("categorical", "text")
+                        f"'{na}{esc(attr._value)}':{nt+1}"
+                        for na, attr in enumerate(map(attrs.get, anames), start=1)
+                        if attr is not None
+                        and attr._type in ("categorical", "text")
+                        and attr._value not in (None, "")
                     )
-                    for nt, attrs in enumerate(tokens)
+                    for nt, attrs in enumerate(tokens, start=len(bulk_fts))
                 ]
                 if fts:
                     mapping.csvs["_fts"].writerow([self._id, " ".join(fts)])
@@ -599,6 +1521,7 @@ class Layer:
             if a in mapping.anchorings:
                 continue
             mapping.anchorings.append(a)
+            corpus._layers_version += 1
         for anc_name in ANCHORINGS:
             if anc_name not in self._anchorings:
                 continue
@@ -608,7 +1531,10 @@ class Layer:
                 v = f"({anc_val[0]},{anc_val[1]}),({anc_val[2]},{anc_val[3]})"
             rows.append(v)
         # Add any new attribute to mapping
+        declared = mapping.declared
         for aname, attr in self._attributes.items():
+            if aname in declared:
+                continue
             atype = attr._type
             if aname in mapping.attributes:
                 mattr = mapping.attributes[aname]
@@ -633,15 +1559,7 @@ class Layer:
             if atype == "ref":
                 mapping.attributes[aname]["ref"] = attr._ref.lower()
             elif atype in ATYPES_LOOKUP and aname != "meta":
-                if aname not in mapping.lookups:
-                    mapping.lookups[aname] = SpillDict()
-                if aname not in mapping.csvs:
-                    fn = f"{self._name.lower()}_{aname.lower()}.csv"
-                    mapping.csvs[aname] = corpus._csv_writer(fn)
-                    if atype == "labels":
-                        mapping.csvs[aname].writerow(["bit", "label"])
-                    else:
-                        mapping.csvs[aname].writerow([f"{aname}_id", aname])
+                mapping.add_lookup(corpus, aname, atype)
         # All attributes
         if is_relation:
             rows = []
@@ -673,18 +1591,16 @@ class Layer:
             if atype in ATYPES_LOOKUP and (aname != "meta" or atype != "dict"):
                 alookup = mapping.lookups[aname]
                 if atype == "labels":
-                    lab_ids = []
+                    mask = 0
                     for lab in val:
                         nlab = alookup.get(lab, None)
                         if nlab is None:
                             nlab = len(alookup)
+                            alookup[lab] = nlab
                             mapping.csvs[aname].writerow([nlab, lab])
-                        alookup[lab] = nlab
-                        lab_ids.append(nlab)
-                    nlabels = int(aopts.get("nlabels", len(alookup)))
+                        mask |= 1 << nlab
                     aopts["nlabels"] = len(alookup)
-                    bits = ["1" if n in lab_ids else "0" for n in range(nlabels)]
-                    val = "".join(b for b in reversed(bits))
+                    val = mask
                 else:
                     lookupid = alookup.get(val, None)
                     if lookupid is None:
@@ -707,9 +1623,8 @@ class Layer:
                 val = int(val)
             val = str(val)
             rows.append("" if val == None else str(val))
-        mapping.csvs["_main"].writerow(rows)
+        mapping.write_row(rows)
         self._made = True
-        self._update_parents_anchors()
         if clear:
             self.clear()
         return self
@@ -775,20 +1690,39 @@ class Layer:
         for layer in layers:
             if layer._name not in mapping.contains:
                 mapping.contains.append(layer._name)
+                self._corpus._layers[layer._name].parents.append(self._name)
+                self._corpus._layers_version += 1
             if self not in layer._parents:
                 layer._parents.append(self)
-            layer._update_parents_anchors()
         return self
 
 
 class Attribute:
-    def __init__(self, layer: Layer, name: str, value: Any = None):
+    # _subtype is only set on float attributes
+    __slots__ = ("_name", "_value", "_ref", "_type", "_subtype")
+
+    def __init__(
+        self, layer: Layer, name: str, value: Any = None, declared: str | None = None
+    ):
         self._name = name
         if name not in layer._attributes:
             layer._attributes[name] = self
-        self._value = value
-        self._layer = layer
         self._ref = None
+        if declared in ATYPES_AS_IS:
+            if layer._corpus._debug:
+                check_declared_type(layer._name, name, value, declared)
+            if declared == "number":
+                if value.__class__ is float:
+                    self._subtype = "float"
+                    mapping = layer._corpus._layers[layer._name]
+                    mapping.attributes[name]["subtype"] = "float"
+            elif value is not None and value.__class__ is not str:
+                # the lookups are keyed by the values
+                value = str(value)
+            self._value = value
+            self._type: str = declared
+            return
+        self._value = value
         atype = "text"
         if isinstance(value, (list, set)):
             atype = "labels"
@@ -812,20 +1746,22 @@ class Attribute:
         elif isinstance(value, Layer):
             atype = "entity"
             self._ref = value._name
-        self._type: str = atype
+        self._type = atype
+        if declared is not None and layer._corpus._debug:
+            assert atype == declared, RuntimeError(
+                f"The attribute '{name}' of {layer._name} is declared as {declared} but got a value of type {atype}: {value!r}"
+            )
 
 
 class GlobalAttribute:
+    __slots__ = ("_name", "_value", "_id")
+
     def __init__(self, corpus: Corpus, name: str, value: dict = {}):
         self._name = name
-        if name not in corpus._global_attributes:
-            lname = name.lower()
-            csv_writer = corpus._csv_writer(f"global_attribute_{lname}.csv")
-            csv_writer.writerow([f"{lname}_id", lname])
-            corpus._global_attributes[name] = {"csv": csv_writer, "ids": {}, "keys": {}}
+        mapping = corpus._global_attribute_mapping(name)
         keys: dict = {}
         for k, v in value.items():
-            assert re.match(r"[a-z][a-zA-Z0-9_]+$", k), RuntimeError(
+            assert IS_ATTRIBUTE_NAME.match(k), RuntimeError(
                 f"The sub-attribute '{k}' on the global attribute {name} does not match the pattern {PATTERN_TXT}"
             )
             keys[k] = list(v) if isinstance(v, set) else v
@@ -833,9 +1769,154 @@ class GlobalAttribute:
             #     k: ",".join(x for x in v) if isinstance(v, (list, set)) else v
             #     for k, v in value.items()
             # }
-            meta_subattr(corpus._global_attributes[name]["keys"], k, v)
+            meta_subattr(mapping["keys"], k, v)
         self._value = keys
-        mapping = corpus._global_attributes[name]
         self._id = str(value.get("id", len(mapping["ids"]) + 1))
         mapping["ids"][self._id] = 1
         mapping["csv"].writerow([self._id, json.dumps(value)])
+
+
+def build_shard(
+    build: Callable[[Corpus, Any], Any],
+    corpus_kwargs: dict,
+    shard: Any,
+    folder: str | None = None,
+) -> str:
+    """
+    Build the corpus of one shard and save it in folder (by default, a new temporary one)
+    """
+    if folder is None:
+        folder = tempfile.mkdtemp(prefix="lcpcli_shard_")
+    else:
+        shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(folder)
+    try:
+        corpus = Corpus(**corpus_kwargs)
+        build(corpus, shard)
+        corpus._save_shard(folder)
+    except BaseException:
+        shutil.rmtree(folder, ignore_errors=True)
+        raise
+    return folder
+
+
+def read_manifest(cache_dir: str, settings: dict) -> dict[str, dict]:
+    """
+    The shards listed in the manifest of cache_dir, or none if it was written
+    with different settings or by another version of lcpcli
+    """
+    try:
+        with open(os.path.join(cache_dir, CACHE_MANIFEST), "r") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("settings") != settings:
+        return {}
+    return manifest.get("shards", {})
+
+
+def build_sharded(
+    build: Callable[[Corpus, Any], Any],
+    shards: Iterable[Any],
+    workers: int = 1,
+    callback: Callable[[int], Any] | None = None,
+    cache_dir: str | None = None,
+    shard_key: Callable[[Any], str] = str,
+    **corpus_kwargs,
+) -> Corpus:
+    """
+    Build the corpus in parallel processes and return it, ready to be made
+    build(corpus, shard) is called for each shard on a new Corpus(**corpus_kwargs)
+    and must make the documents of the shard; the shards are then merged in order,
+    as if a single corpus had made all the documents. In each shard, the frame
+    ranges must start from 0, like the char ranges do
+    callback is called with the number of shards merged so far
+    With cache_dir, each shard is kept in the subfolder shard_key(shard) of cache_dir
+    and is only built if it is not listed in the manifest of cache_dir yet, so
+    shard_key must change whenever the content of the shard changes
+    """
+    corpus = Corpus(**corpus_kwargs)
+    shards = list(shards)
+    folders: list[str | None] = [None] * len(shards)
+    cached: dict[str, dict] = {}
+    settings = {
+        "version": __version__,
+        "corpus": json.loads(json.dumps(corpus_kwargs, default=str)),
+    }
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        folders = [os.path.join(cache_dir, shard_key(shard)) for shard in shards]
+        cached = {
+            key: shard
+            for key, shard in read_manifest(cache_dir, settings).items()
+            if os.path.exists(os.path.join(cache_dir, key, SHARD_STATE))
+        }
+        # the manifest is rewritten once all the shards are merged
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(cache_dir, CACHE_MANIFEST))
+    to_build = [
+        (shard, folder)
+        for shard, folder in zip(shards, folders)
+        if folder is None or os.path.basename(folder) not in cached
+    ]
+    build_in_folder = partial(build_shard, build, corpus_kwargs)
+    built: Iterator[str]
+    futures: list[Future] = []
+    if workers > 1 and to_build:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        futures = [
+            executor.submit(build_in_folder, shard, folder)
+            for shard, folder in to_build
+        ]
+        built = (future.result() for future in futures)
+    else:
+        built = (build_in_folder(shard, folder) for shard, folder in to_build)
+    merged: dict[str, dict] = {}
+    n_built = 0
+    try:
+        for n_shard, (shard, folder) in enumerate(zip(shards, folders), start=1):
+            key = folder and os.path.basename(folder)
+            if key is None or key not in cached:
+                folder = next(built)
+                n_built += 1
+            assert folder is not None
+            corpus._merge_shard(folder, keep=key is not None)
+            if key is not None:
+                merged[key] = {"shard": str(shard)}
+            if callback:
+                callback(n_shard)
+    except BaseException:
+        # remove the temporary folders of the shards built but not merged
+        for future in futures[n_built:]:
+            future.cancel()
+        for (_, folder), future in zip(to_build[n_built:], futures[n_built:]):
+            if folder is None and not future.cancelled() and not future.exception():
+                shutil.rmtree(future.result(), ignore_errors=True)
+        raise
+    finally:
+        if workers > 1 and to_build:
+            executor.shutdown()
+    if cache_dir is not None:
+        # remove the shards of the inputs that changed or disappeared
+        for fn in os.listdir(cache_dir):
+            if fn not in merged:
+                shutil.rmtree(os.path.join(cache_dir, fn), ignore_errors=True)
+        manifest = {"settings": settings, "shards": merged}
+        with open(os.path.join(cache_dir, CACHE_MANIFEST), "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+    return corpus
+
+
+def make_sharded(
+    build: Callable[[Corpus, Any], Any],
+    shards: Iterable[Any],
+    destination: str = "./",
+    workers: int = 1,
+    is_global: dict = {},
+    **corpus_kwargs,
+) -> None:
+    """
+    Build the corpus with build_sharded and write its files to destination
+    """
+    corpus = build_sharded(build, shards, workers=workers, **corpus_kwargs)
+    corpus.make(destination, is_global=is_global, workers=workers)
@@ -1,18 +1,31 @@
+import copy
 import csv
+import io
 import json
 import os
 import re
 import sys
 
+from collections.abc import Collection
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 from jsonschema import validate
-from typing import Callable
+from typing import Any, Callable
 from uuid import UUID
 
+from .progress import Progress
+
 EXTENSIONS = (".csv", ".tsv")
+# size of the read buffer of the files checked row by row
+READ_BUFSIZE = 1024 * 1024
+# files larger than this are checked in chunks of about this size in parallel
+CHUNK_SIZE = 64 * 1024 * 1024
 LOOKUP_TYPES = ("dict", "text")
 NAMEDATALEN = 63
 
 IS_NUM = re.compile(r"^[0-9]+(\.[0-9]+)?$")
+RANGE = re.compile(r"\[(\d+),(\d+)\)")
+DIGITS = "0123456789"
 
 
 def is_lookup(p: dict) -> bool:
@@ -26,17 +39,108 @@ def try_filename(path: str, no_ext: str) -> str:
     return fpath
 
 
+def raise_field_size_limit() -> None:
+    # hack to circumvent errors on windows (ref: https://stackoverflow.com/a/15063941)
+    maxInt = sys.maxsize
+    while True:
+        try:
+            csv.field_size_limit(maxInt)
+            break
+        except OverflowError:
+            maxInt = int(maxInt / 10)
+
+
+def record_starts(
+    path: str, offsets: list[int], quote: str = '"', delimiter: str = ","
+) -> list[tuple[int, int]] | None:
+    """
+    The byte offset of the first record of the file that starts at or after each of
+    the sorted offsets, along with the number of lines before it (the size of the
+    file and its number of lines past the last record)
+    Lines are counted as in files opened with newline="", which also split on \\r
+    Records end with a newline preceded by an even number of quote characters, which
+    holds when quote characters only enclose values and are doubled in them, as
+    csv.writer writes them: return None if the file has another quote character
+    """
+    bquote, bdelimiter = quote.encode("utf-8"), delimiter.encode("utf-8")
+    # the quoted values, which start and end at the delimiters or at the newlines
+    # (the quote comes first in the pattern so that it is searched for quickly)
+    quoted = re.compile(
+        rb"%(q)s(?<![^%(d)s\r\n]%(q)s)[^%(q)s]*(?:%(q)s%(q)s[^%(q)s]*)*%(q)s(?=[%(d)s\r\n]|\Z)"
+        % {b"q": re.escape(bquote), b"d": re.escape(bdelimiter)}
+    )
+    starts: list[tuple[int, int]] = []
+    targets = iter(offsets)
+    target = next(targets, None)
+    pos = quotes = lines = 0
+    tail = b""
+    with open(path, "rb") as input:
+        while target is not None:
+            data = input.read(READ_BUFSIZE)
+            block = tail + data
+            if not block:
+                break
+            # cut the blocks after a newline, so no \r\n and few values span two
+            cut = block.rfind(b"\n") + 1 if data else len(block)
+            if not cut:
+                tail = block
+                continue
+            block, tail = block[:cut], block[cut:]
+            if bquote in quoted.sub(b"", block):
+                return None
+            # quotes and lines are counted up to i in block
+            i = 0
+            while target is not None:
+                j = block.find(b"\n", max(target - pos - 1, i))
+                if j < 0:
+                    break
+                quotes += block.count(bquote, i, j)
+                lines += count_lines(block, i, j + 1)
+                i = j + 1
+                if quotes % 2:
+                    continue
+                while target is not None and target <= pos + i:
+                    starts.append((pos + i, lines))
+                    target = next(targets, None)
+            quotes += block.count(bquote, i)
+            lines += count_lines(block, i, len(block))
+            pos += len(block)
+    while target is not None:
+        starts.append((pos, lines))
+        target = next(targets, None)
+    return starts
+
+
+def count_lines(block: bytes, start: int, end: int) -> int:
+    """The number of \\n, \\r\\n or \\r line endings between start and end"""
+    return (
+        block.count(b"\n", start, end)
+        + block.count(b"\r", start, end)
+        - block.count(b"\r\n", start, end)
+    )
+
+
+def check_file(
+    checker: "Checker",
+    filename: str,
+    directory: str,
+    add_zero: bool = False,
+    callback: Callable | None = None,
+    chunk: tuple[int, int, int] | None = None,
+) -> Callable | None:
+    """
+    Check each row of filename (or of a chunk of it) in its own process, and return
+    the callback with the state it gathered so it can be merged in the main process
+    """
+    raise_field_size_limit()
+    checker.check_existing_file(filename, directory, add_zero, callback, chunk=chunk)
+    return callback
+
+
 class Checker:
 
     def __init__(self, config, **kwargs):
-        # hack to circumvent errors on windows (ref: https://stackoverflow.com/a/15063941)
-        maxInt = sys.maxsize
-        while True:
-            try:
-                csv.field_size_limit(maxInt)
-                break
-            except OverflowError:
-                maxInt = int(maxInt / 10)
+        raise_field_size_limit()
         self.config = config
         self.token = config.get("firstClass", {}).get("token", "")
         self.segment = config.get("firstClass", {}).get("segment", "")
@@ -102,7 +206,7 @@ class Checker:
             f"Float number attribute {aname} is ill-formed: {value}"
         )
 
-    def check_categorical(self, value: str, values: None | list[str]) -> None:
+    def check_categorical(self, value: str, values: None | Collection[str]) -> None:
         assert len(value.encode("utf-8")) <= NAMEDATALEN, ValueError(
             f"Found a categorical value ('{value}') that exceeds the database's limit of {NAMEDATALEN} bytes on enum values"
         )
@@ -153,24 +257,49 @@ class Checker:
         return None
 
     def check_ftsvector(self, vector: str) -> None:
-        whole_pattern = r"^('\d+([^']|'')*':\d+(,\d+)*(\s|$))+$"
-        simple_unit_pattern = r"('([^']|'')*':[^\s]+)(\s|$)"
-        units = re.findall(simple_unit_pattern, vector)
-        for n, (unit, *_) in enumerate(units):
-            assert unit.startswith("'"), SyntaxError(
-                f"Each value in the tsvector must start with a single quote character ({unit} -- {n})"
+        """
+        Check the units 'Nvalue':P1,P2 of vector, separated by single whitespaces,
+        in a single pass over its characters: the single quotes in values are doubled
+        """
+        size = len(vector)
+        n = i = 0
+        while True:
+            assert (
+                vector.startswith("'", i) and i + 1 < size and vector[i + 1] in DIGITS
+            ), SyntaxError(
+                f"Each value in the tsvector must start with a single quote character followed by an integer index (unit {n} at offset {i} in {vector})"
             )
-            assert re.match(r"'\d+", unit), SyntaxError(
-                f"Each value in the tsvector must start with a single quote character followed by an integer index ({unit} -- {n})"
+            # the value ends with the first single quote that is not doubled
+            j = vector.find("'", i + 2)
+            while j >= 0 and vector.startswith("'", j + 1):
+                j = vector.find("'", j + 2)
+            assert j >= 0, SyntaxError(
+                f"Each value in the tsvector must end with a single quote (unit {n} at offset {i} in {vector})"
             )
-            m = re.match(r"'\d+(.*)':\d+(,\d+)*\s?$", unit)
-            assert m, SyntaxError(
-                f"Each value in the tsvector must end with a single quote followed by a colon and an integer index ({unit} -- {n})"
+            k = j + 1
+            assert (
+                vector.startswith(":", k) and k + 1 < size and vector[k + 1] in DIGITS
+            ), SyntaxError(
+                f"Each value in the tsvector must end with a single quote followed by a colon and an integer index (unit {n} at offset {k} in {vector})"
             )
-        assert re.match(whole_pattern, vector), SyntaxError(
-            f"Invalid tsvector string ({vector})"
-        )
-        return None
+            # the positions, separated by commas
+            k += 2
+            while k < size:
+                if vector[k] in DIGITS:
+                    k += 1
+                elif vector[k] == "," and k + 1 < size and vector[k + 1] in DIGITS:
+                    k += 2
+                else:
+                    break
+            if k == size:
+                return None
+            assert vector[k].isspace(), SyntaxError(
+                f"The values in the tsvector must be separated by a whitespace (unit {n} at offset {k} in {vector})"
+            )
+            i = k + 1
+            if i == size:
+                return None
+            n += 1
 
     def check_range(self, range: str, name: str) -> None:
         m = re.match(r"\[(\d+),(\d+)\)", range)
@@ -378,13 +507,122 @@ class Checker:
                     self.check_labels_file(path, layer_name, aname)
         return None
 
+    def column_check(
+        self,
+        header: str,
+        typ: str,
+        nullable: bool,
+        subtyps: dict,
+        layer_name: str,
+        filename: str,
+    ) -> Callable[[str], Any] | None:
+        """
+        Compile the function that checks the values of a column, or None if any
+        value is valid. The common valid values are recognized without calling the
+        check_* methods, which are only called to report invalid values
+        """
+        check: Callable[[str], Any] | None = None
+        aprops: dict = {}
+        if layer_name:
+            aprops = self.config["layer"][layer_name].get("attributes", {})
+            aprops = aprops.get(header, {})
+        if typ in ("labels", "categorical") and not layer_name:
+            message = (
+                f"Attributes of type '{typ}' are only supported on layers ({filename})"
+            )
+
+            def check(value: str) -> None:
+                raise NotImplementedError(message)
+
+        elif typ == "int":
+            check = int
+        elif typ == "dict":
+            check = partial(self.check_dict, subtyps=subtyps)
+        elif typ == "labels":
+            nbit = aprops.get("nlabels")
+
+            def check(value: str) -> None:
+                if len(value) != nbit or value.strip("01"):
+                    self.check_labels(value, aprops["nlabels"])
+
+        elif typ == "range":
+
+            def check(value: str) -> None:
+                m = RANGE.match(value)
+                if not m or int(m[1]) >= int(m[2]):
+                    self.check_range(value, header)
+
+        elif typ == "xy_box":
+            check = partial(self.check_xy_box, name=header)
+        elif typ == "uuid":
+            check = self.check_uuid
+        elif typ == "ftsvector":
+            check = self.check_ftsvector
+        elif typ == "number":
+
+            def check(value: str) -> None:
+                if not (value.isdigit() and value.isascii()):
+                    self.check_number(value, header)
+
+        elif typ == "float":
+
+            def check(value: str) -> None:
+                if not IS_NUM.match(value):
+                    self.check_float(value, header)
+
+        elif typ == "categorical":
+            values: set[str] | None = None
+            if not aprops.get("isGlobal") and aprops.get("values"):
+                values = set(aprops["values"])
+            # the values already found valid
+            valid: set[str] = set()
+
+            def check(value: str) -> None:
+                if value in valid:
+                    return
+                self.check_categorical(value, values)
+                valid.add(value)
+
+        if nullable:
+            if check is None:
+                return None
+            not_empty_check = check
+
+            def check(value: str) -> None:
+                if value:
+                    not_empty_check(value)
+
+        elif check is None:
+
+            def check(value: str) -> None:
+                if not value:
+                    raise ValueError(f"Empty value for {header}")
+
+        else:
+            not_empty_check = check
+
+            def check(value: str) -> None:
+                if not value:
+                    raise ValueError(f"Empty value for {header}")
+                not_empty_check(value)
+
+        return check
+
     def check_existing_file(
         self,
         filename: str,
         directory: str,
         add_zero: bool = False,
         callback: Callable | None = None,
+        progress: Progress | None = None,
+        offset: int = 0,
+        chunk: tuple[int, int, int] | None = None,
     ) -> None:
+        """
+        Check each row of the file; progress is moved to offset + the bytes read
+        With chunk (the byte offset of the first row, the number of lines before it
+        and the byte offset past the last row), only check the rows of that chunk
+        """
         layer = self.config.get("layer", {})
         layer_name = ""
         nullables = set()
@@ -492,83 +730,78 @@ class Checker:
                     columns["name"] = "text"
                     columns["media"] = "dict"
 
-        with open(os.path.join(directory, filename), "r", encoding="utf-8") as input:
-            headers: list[str] = []
-            counter = 0
-            while line := input.readline():
-                counter += 1
-                cols = self.parseline(line)
-                if not headers:
-                    headers = cols
-                    for h in headers:
-                        assert h in columns, ReferenceError(
-                            f"Found unexpected column named {h} in {filename}"
-                        )
-                    continue
+        # the text is read through input, the byte offsets come from raw_input
+        with (
+            open(
+                os.path.join(directory, filename), "rb", buffering=READ_BUFSIZE
+            ) as raw_input,
+            io.TextIOWrapper(raw_input, encoding="utf-8", newline="") as input,
+        ):
+            # a single reader, so that quoted values can span several lines
+            reader = csv.reader(
+                input,
+                delimiter=self.delimiter,
+                quotechar=self.quote,
+                escapechar=self.escape,
+            )
+            headers: list[str] = next(reader, [])
+            for h in headers:
+                assert h in columns, ReferenceError(
+                    f"Found unexpected column named {h} in {filename}"
+                )
+            checks = [
+                (n, check)
+                for n, h in enumerate(headers)
+                if (
+                    check := self.column_check(
+                        h,
+                        columns[h],
+                        h in nullables,
+                        subtyps.get(h) or {},
+                        layer_name,
+                        filename,
+                    )
+                )
+            ]
+            # the number of lines before the lines read by reader
+            first_line = 0
+            if chunk:
+                start, first_line, end = chunk
+                raw_input.seek(start)
+                rows = raw_input.read(end - start).decode("utf-8")
+                reader = csv.reader(
+                    io.StringIO(rows, newline=""),
+                    delimiter=self.delimiter,
+                    quotechar=self.quote,
+                    escapechar=self.escape,
+                )
+            last_line = reader.line_num
+            for cols in reader:
+                # the line on which the row starts (quoted values can contain newlines)
+                counter = first_line + last_line + 1
+                last_line = reader.line_num
+                if progress and progress.due():
+                    progress.update(offset + raw_input.tell())
                 assert len(cols) == len(headers), SyntaxError(
                     f"Found {len(cols)} values on line {counter} in {filename}, expected {len(headers)}."
                 )
                 if callback:
                     callback(cols, headers, filename, layer_name, self.config)
-                for n, col in enumerate(cols):
-                    typ = columns[headers[n]]
-                    if not col:
-                        assert headers[n] in nullables, ValueError(
-                            f"Found an empty value for column #{n+1} ({headers[n]}) on line {counter} in {filename} even though the configuration does not report it as nullable"
+                try:
+                    for n, check in checks:
+                        check(cols[n])
+                except Exception as e:
+                    assert cols[n] or headers[n] in nullables, ValueError(
+                        f"Found an empty value for column #{n+1} ({headers[n]}) on line {counter} in {filename} even though the configuration does not report it as nullable"
+                    )
+                    if columns[headers[n]] == "int":
+                        raise ValueError(
+                            f"Excepted int value for column #{n+1} ({headers[n]}) on line {counter} in {filename}, got {cols[n]} ({self.delimiter.join(cols)})"
                         )
-                        continue
-                    if typ == "int":
-                        try:
-                            int(col)
-                        except:
-                            raise ValueError(
-                                f"Excepted int value for column #{n+1} ({headers[n]}) on line {counter} in {filename}, got {col} ({line})"
-                            )
-                    else:
-                        try:
-                            if typ == "dict":
-                                self.check_dict(col, subtyps.get(headers[n], {}))
-                            elif typ == "labels":
-                                assert layer_name, NotImplementedError(
-                                    f"Attributes of type 'labels' are only supported on layers ({filename})"
-                                )
-                                aprops = (
-                                    layer[layer_name]
-                                    .get("attributes", {})
-                                    .get(headers[n], {})
-                                )
-                                nbit = aprops["nlabels"]
-                                self.check_labels(col, nbit)
-                            elif typ == "range":
-                                self.check_range(col, headers[n])
-                            elif typ == "xy_box":
-                                self.check_xy_box(col, headers[n])
-                            elif typ == "uuid":
-                                self.check_uuid(col)
-                            elif typ == "ftsvector":
-                                self.check_ftsvector(col)
-                            elif typ == "number":
-                                self.check_number(col, headers[n])
-                            elif typ == "float":
-                                self.check_float(col, headers[n])
-                            elif typ == "categorical":
-                                assert layer_name, NotImplementedError(
-                                    f"Attributes of type 'categorical' are only supported on layers ({filename})"
-                                )
-                                aprops = (
-                                    layer[layer_name]
-                                    .get("attributes", {})
-                                    .get(headers[n], {})
-                                )
-                                values = None
-                                if not aprops.get("isGlobal"):
-                                    values = aprops.get("values") or None
-                                self.check_categorical(col, values)
-                        except Exception as e:
-                            l = line.rstrip("\n")
-                            raise ValueError(
-                                f"{e} ({headers[n]} in {filename}:{counter}:{n+1} -- '{l}')"
-                            )
+                    l = self.delimiter.join(cols)
+                    raise ValueError(
+                        f"{e} ({headers[n]} in {filename}:{counter}:{n+1} -- '{l}')"
+                    )
 
     def check_config(self) -> None:
         mandatory_keys = ("layer", "firstClass", "meta")
@@ -621,18 +854,50 @@ class Checker:
             print("validated json schema")
         return None
 
+    def file_chunks(
+        self, filename: str, directory: str, chunk_size: int = CHUNK_SIZE
+    ) -> list[tuple[int, tuple[int, int, int] | None]]:
+        """
+        Split the rows of a file larger than chunk_size into chunks of about that
+        size, aligned on records, as (size, chunk) pairs to pass to check_existing_file
+        The files with an escape character, or with quote characters that do not
+        enclose values, are not split
+        """
+        path = os.path.join(directory, filename)
+        size = os.path.getsize(path)
+        n_chunks = -(-size // chunk_size)
+        if n_chunks < 2 or self.escape:
+            return [(size, None)]
+        # the first record starting after the first byte is the first row
+        offsets = [1, *(size * n // n_chunks for n in range(1, n_chunks))]
+        starts = record_starts(path, offsets, self.quote, self.delimiter)
+        if starts is None:
+            return [(size, None)]
+        bounds = sorted({start for start, _ in starts} | {size})
+        lines = dict(starts)
+        return [
+            (end - start, (start, lines[start], end))
+            for start, end in zip(bounds, bounds[1:])
+        ]
+
     def run_checks(
         self,
         directory: str,
         full: bool = True,
         add_zero: bool = False,
         callback: Callable | None = None,
+        workers: int = 1,
+        chunk_size: int = CHUNK_SIZE,
     ) -> None:
         """
         Check the headers of the files corresponding to the layers in directory
         If full, also check each row
         If add_zero, will use the suffix 0 when checking token and segment files
         Callback will be run on each row (presupposes full)
+        With workers > 1 the files are checked in parallel processes, largest first,
+        and the files larger than chunk_size are checked in chunks in parallel too:
+        callback must then be picklable and have a merge method: each process checks
+        a file or a chunk with a copy of callback, which is then merged into callback
         """
         self.check_config()
         layer = self.config.get("layer", {})
@@ -641,9 +906,69 @@ class Checker:
             self.check_layer(directory, layer_name, layer_properties, add_zero)
         if not full:
             return None
-        for filename in os.listdir(directory):
-            if not filename.endswith(EXTENSIONS):
-                continue
-            print(f"Checking file {filename}")
-            self.check_existing_file(filename, directory, add_zero, callback)
+        filenames = [f for f in os.listdir(directory) if f.endswith(EXTENSIONS)]
+        sizes = [os.path.getsize(os.path.join(directory, f)) for f in filenames]
+        progress = Progress(sum(sizes), desc="Checking files")
+        offset = 0
+        tasks: list[tuple[int, str, tuple[int, int, int] | None]] = []
+        if workers > 1:
+            tasks = [
+                (size, filename, chunk)
+                for filename in filenames
+                for size, chunk in self.file_chunks(filename, directory, chunk_size)
+            ]
+        if len(tasks) > 1:
+            assert callback is None or hasattr(callback, "merge"), TypeError(
+                "Checking files in parallel requires a callback with a merge method"
+            )
+            # the number of chunks of each file still being checked
+            remaining = {filename: 0 for filename in filenames}
+            for _, filename, _ in tasks:
+                remaining[filename] += 1
+            errors: dict[tuple[str, int], Exception] = {}
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    # copied now: the calls are only pickled when a process is free
+                    executor.submit(
+                        check_file,
+                        self,
+                        filename,
+                        directory,
+                        add_zero,
+                        copy.deepcopy(callback),
+                        chunk,
+                    ): (filename, size, chunk[0] if chunk else 0)
+                    for size, filename, chunk in sorted(
+                        tasks, key=lambda t: t[0], reverse=True
+                    )
+                }
+                for future in as_completed(futures):
+                    filename, size, start = futures[future]
+                    offset += size
+                    remaining[filename] -= 1
+                    try:
+                        checked_callback = future.result()
+                    except Exception as e:
+                        errors[(filename, start)] = e
+                        progress.write(f"Error in file {filename}: {e}")
+                        continue
+                    if callback is not None:
+                        callback.merge(checked_callback)
+                    if not remaining[filename] and all(
+                        f != filename for f, _ in errors
+                    ):
+                        progress.write(f"Checked file {filename}")
+                    progress.update(offset, f"Checked {filename}")
+            if errors:
+                progress.close(offset, f"{len(errors)} error(s)")
+                raise errors[min(errors)]
+        else:
+            for filename, size in zip(filenames, sizes):
+                progress.write(f"Checking file {filename}")
+                progress.update(offset, f"Checking {filename}")
+                self.check_existing_file(
+                    filename, directory, add_zero, callback, progress, offset
+                )
+                offset += size
+        progress.close(offset, "All files checked")
         return None
@@ -1,6 +1,8 @@
 import argparse
 from typing import Any
 
+from .progress import Progress
+
 BOOL_KWARGS: dict[str, Any]
 
 try:
@@ -23,6 +25,20 @@ def _parse_cmd_line():
     parser.add_argument(
         "-e", "--extension", type=str, help="Output format when output is a directory"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        required=False,
+        default=1,
+        help="Number of processes used to convert the input files and to check the files before the upload (default is 1)",
+    )
+    parser.add_argument(
+        "--incremental",
+        required=False,
+        default=False,
+        help="Keep each converted input file in the output directory and only convert again the files that changed since the last run",
+        **BOOL_KWARGS,
+    )
     parser.add_argument(
         "-x",
         "--example",
@@ -132,7 +148,7 @@ def _parse_cmd_line():
                 "--conll-only",
                 required=False,
                 default=False,
-                help="Used in conjunction with -i/-o, will ignore any file not ending in .conll/.conllu from the input directory.",
+                help="Used in conjunction with -i/-o, will ignore any file not ending in .conll/.conllu (optionally followed by .gz/.xz/.bz2) from the input directory.",
                 **BOOL_KWARGS,
             )
             parser.add_argument(
@@ -142,6 +158,13 @@ def _parse_cmd_line():
                 help="Skip the local checks before uploading the corpus (the server may still run checks).",
                 **BOOL_KWARGS,
             )
+            parser.add_argument(
+                "--quiet",
+                required=False,
+                default=False,
+                help="Do not display progress bars.",
+                **BOOL_KWARGS,
+            )
             parser.add_argument(
                 "-v",
                 "--version",
@@ -158,6 +181,7 @@ def _parse_cmd_line():
                 raise e
 
     kwargs = vars(parser.parse_args())
+    Progress.quiet = bool(kwargs.pop("quiet", False))
     kwargs["content"] = kwargs.pop("input", "")
     kwargs["template"] = kwargs.pop("json", False)
     kwargs["provided_url"] = kwargs.pop("url", "")
@@ -1,10 +1,13 @@
 import os
 import re
 
-from collections.abc import Iterable, Iterator
+from collections.abc import Callable, Container, Iterable, Iterator
+from functools import lru_cache
 from pathlib import Path
+from typing import Any
 from lcpcli.builder import *
-from tqdm import tqdm
+from lcpcli.progress import Progress
+from lcpcli.utils import file_hash, open_input, strip_compression
 
 CONLLU_COLUMNS = (
     "ID",
@@ -20,6 +23,12 @@ CONLLU_COLUMNS = (
 )
 
 IS_NUM = re.compile(r"^[0-9]+(\.[0-9]+)?$")
+# lines starting with 0 is not valid CoNLLU syntax but we'll allow it
+TOKEN_LINE = re.compile(r"[0-9]+\t")
+COMMENT_LINE = re.compile(r"# ([^=]+)=(.+)$")
+DIGITS = frozenset("0123456789")
+# FEATS and MISC values repeat a lot across tokens
+PAIRS_CACHE_SIZE = 2**16
 
 
 class LayerProxy:
@@ -57,13 +66,35 @@ class SentenceProxy(LayerProxy):
         self.tokens: dict[str, TokenProxy] = {}
 
 
+def to_value(value: str) -> str | int | float:
+    """Converts a column value to a number if it looks like one"""
+    if value.isdigit() and value.isascii():
+        return int(value)
+    if "." in value and IS_NUM.match(value):
+        return float(value)
+    return value
+
+
+@lru_cache(maxsize=PAIRS_CACHE_SIZE)
+def parse_pairs(misc: str) -> tuple[tuple[str, str], ...]:
+    """Splits a string like k=v|x=y into ((k,v),(x,y)) in one pass"""
+    pairs = []
+    for x in misc.strip().split("|"):
+        if not x:
+            continue
+        k, sep, v = x.partition("=")
+        if not sep:
+            raise IndexError(f"No value for '{x}' in '{misc}'")
+        k = k.strip()
+        v = v.partition("=")[0].strip()
+        if k and v:
+            pairs.append((k, v))
+    return tuple(pairs)
+
+
 def get_obj(misc: str) -> dict:
     """Converts a string like k=v|x=y into a dict like {k:v,x:y}"""
-    return {
-        x.split("=")[0].strip(): x.split("=")[1].strip()
-        for x in misc.strip().split("|")
-        if x and x.split("=")[0].strip() and x.split("=")[1].strip()
-    }
+    return dict(parse_pairs(misc))
 
 
 def process_sent(c, sent: SentenceProxy):
@@ -107,63 +138,103 @@ def process_sent(c, sent: SentenceProxy):
         ).make()
 
 
+def corpus_kwargs(corpus_name: str, config: dict) -> dict:
+    config_keys = [k for k in Corpus.__init__.__annotations__ if k != "name"]
+    return {
+        "name": corpus_name,
+        **{k: v for k, v in config.items() if k in config_keys},
+    }
+
+
 def create_corpus(
     input: Iterable[str], corpus_name: str = "Untitled corpus", config: dict = {}
 ) -> Corpus:
-    config_keys = [k for k in Corpus.__init__.__annotations__ if k != "name"]
-    c = Corpus(corpus_name, **{k: v for k, v in config.items() if k in config_keys})
+    c = Corpus(**corpus_kwargs(corpus_name, config))
+    add_documents(c, input)
+    print("Corpus created")
+    return c
+
+
+def column_plan(
+    column_names: list[str], text_columns: Container[str] = ()
+) -> list[tuple[int, str, bool]]:
+    """
+    The index in the columns after FORM, the name and whether to keep the raw value
+    of each column that becomes a token attribute
+    The values of text_columns (declared as text in the schema) are kept raw too
+    """
+    return [
+        (n, x, x in ("feats", "misc") or x in text_columns)
+        for n, x in enumerate(column_names[2:])
+    ]
+
+
+def add_documents(c: Corpus, input: Iterable[str]) -> None:
+    """
+    Make the documents of the CoNLL-U lines in input
+    """
     column_names: list[str] = [x.strip().lower() for x in CONLLU_COLUMNS]
+    text_columns = {
+        aname
+        for aname, aopts in c._schema.get(c._token, {}).items()
+        if aopts["type"] == "text"
+    }
+    columns = column_plan(column_names, text_columns)
     current_doc: LayerProxy = LayerProxy()
     current_par: LayerProxy = LayerProxy()
     current_sent: SentenceProxy = SentenceProxy()
     comment_for: str = "sentence"
     try:
         for line in input:
-            # lines starting with 0 is not valid CoNLLU syntax but we'll allow it
-            token_line = re.search(r"^[0-9]+\t", line)
+            first = line[:1]
+            token_line = first in DIGITS and TOKEN_LINE.match(line)
             if not token_line and current_sent.assigned and current_sent.tokens:
                 process_sent(c, current_sent)
                 current_par = LayerProxy()
                 current_sent = SentenceProxy()
-            if not line.strip():
+            if token_line:
+                pass
+            elif first == "#":
+                if line.startswith("# global.columns = "):
+                    column_names = [x.strip().lower() for x in line[19:].split("\t")]
+                    if len(column_names) < 2:
+                        column_names = [x.strip().lower() for x in line[19:].split(" ")]
+                    assert len(column_names) >= 2, ValueError(
+                        f"CoNLL-U files must define at least two columns: ID and FORM; got {column_names} instead."
+                    )
+                    columns = column_plan(column_names, text_columns)
+                    continue
+                elif line.startswith("# newdoc "):
+                    comment_for = "document"
+                    attr, val = [x.strip() for x in line[9:].split("=", 1)]
+                    if attr == "id":
+                        if current_doc.assigned:
+                            current_doc.entity.make()
+                        current_doc = LayerProxy()
+                    current_doc.set_attribute(attr, val)
+                    continue
+                elif line.startswith("# newpar "):
+                    comment_for = "paragraph"
+                    attr, val = [x.strip() for x in line[9:].split("=", 1)]
+                    current_par.set_attribute(attr, val)
+                elif line.startswith("# sent_id "):
+                    comment_for = "sentence"
+                    assert current_doc, RuntimeError(
+                        "Encountered a new sentence before a new document"
+                    )
+                if m := COMMENT_LINE.match(line):
+                    attr, val = [x.strip() for x in (m[1], m[2])]
+                    if attr and val:
+                        if comment_for == "sentence":
+                            current_sent.set_attribute(attr, val)
+                        elif comment_for == "paragraph":
+                            current_par.set_attribute(attr, val)
+                        else:
+                            current_doc.set_attribute(attr, val)
+            elif not line.strip():
                 # empty line: default back to sentence
                 comment_for = "sentence"
                 continue
-            if line.startswith("# global.columns = "):
-                column_names = [x.strip().lower() for x in line[19:].split("\t")]
-                if len(column_names) < 2:
-                    column_names = [x.strip().lower() for x in line[19:].split(" ")]
-                assert len(column_names) >= 2, ValueError(
-                    f"CoNLL-U files must define at least two columns: ID and FORM; got {column_names} instead."
-                )
-                continue
-            elif line.startswith("# newdoc "):
-                comment_for = "document"
-                attr, val = [x.strip() for x in line[9:].split("=", 1)]
-                if attr == "id":
-                    if current_doc.assigned:
-                        current_doc.entity.make()
-                    current_doc = LayerProxy()
-                current_doc.set_attribute(attr, val)
-                continue
-            elif line.startswith("# newpar "):
-                comment_for = "paragraph"
-                attr, val = [x.strip() for x in line[9:].split("=", 1)]
-                current_par.set_attribute(attr, val)
-            elif line.startswith("# sent_id "):
-                comment_for = "sentence"
-                assert current_doc, RuntimeError(
-                    "Encountered a new sentence before a new document"
-                )
-            if m := re.match(r"# ([^=]+)=(.+)$", line):
-                attr, val = [x.strip() for x in (m[1], m[2])]
-                if attr and val:
-                    if comment_for == "sentence":
-                        current_sent.set_attribute(attr, val)
-                    elif comment_for == "paragraph":
-                        current_par.set_attribute(attr, val)
-                    else:
-                        current_doc.set_attribute(attr, val)
 
             if current_doc.assigned and current_par.attributes:
                 current_par.assign_entity(
@@ -206,34 +277,31 @@ def create_corpus(
                 "" if x == "_" else x.strip() for x in line.split("\t")
             ]
             if "-" in token_id:
-                misc = ""
+                misc_str = ""
                 if "misc" in column_names:
-                    misc = rest[column_names.index("misc") - 2]
-                current_sent.mwu.append((misc, form, token_id.split("-")))
+                    misc_str = rest[column_names.index("misc") - 2]
+                current_sent.mwu.append((misc_str, form, token_id.split("-")))
             else:
-                kwargs: dict = {}
-                for n, x in enumerate(column_names[2:]):
-                    kwargs[x] = rest[n]
-                    if IS_NUM.match(rest[n]):
-                        kwargs[x] = float(rest[n]) if "." in rest[n] else int(rest[n])
-                if "feats" in column_names:
-                    feats_idx = column_names.index("feats")
-                    feats_str = rest[feats_idx - 2]
+                kwargs: dict[str, Any] = {
+                    x: rest[n] if raw else to_value(rest[n]) for n, x, raw in columns
+                }
+                if "feats" in kwargs:
+                    feats_str = rest[column_names.index("feats") - 2]
                     try:
                         kwargs["feats"] = get_obj(feats_str)
                     except:
                         kwargs["feats"] = feats_str
-                if "misc" in column_names:
-                    misc_idx = column_names.index("misc")
-                    kwargs["misc"] = get_obj(rest[misc_idx - 2])
+                if "misc" in kwargs:
+                    misc_attrs = get_obj(rest[column_names.index("misc") - 2])
+                    kwargs["misc"] = misc_attrs
                     # special case
-                    if "SpaceAfter" in kwargs["misc"]:
+                    if "SpaceAfter" in misc_attrs:
                         kwargs["spaceAfter"] = (
-                            0 if kwargs["misc"].pop("SpaceAfter") == "No" else 1
+                            0 if misc_attrs.pop("SpaceAfter") == "No" else 1
                         )
                 token_proxy = TokenProxy()
                 head_val = kwargs.get("head", "")
-                if head_val and head_val != "_":
+                if head_val != "" and head_val != "_":
                     token_proxy.head = str(int(kwargs.pop("head")))
                 if "deprel" in kwargs:
                     token_proxy.deprel = kwargs.pop("deprel")
@@ -248,60 +316,90 @@ def create_corpus(
         current_par = LayerProxy()
         if current_doc.assigned:
             current_doc.entity.make()
-        print("Corpus created")
     except Exception as e:
         raise RuntimeError(f"""Error when creating the corpus:
             {str(e)}
             Are all input files valid CoNLL-U files?""")
-    return c
 
 
-def process_files(fns: list[str], config: dict) -> Corpus:
+def read_file(
+    fn: str, progress: Progress | None = None, offset: int = 0
+) -> Iterator[str]:
+    """
+    Yield the lines of the CoNLL-U file fn (possibly compressed), as a new document
+    with the default columns
+    progress is moved to offset + the number of bytes read from fn
+    """
+    with open_input(fn) as (input, raw):
+        tab_columns = "\t".join(CONLLU_COLUMNS)
+        yield f"# global.columns = {tab_columns}"
+        no_ext = Path(strip_compression(fn)).stem
+        yield f"# newdoc id = {no_ext}"
+        for line in input:
+            if progress and progress.due():
+                progress.update(offset + raw.tell())
+            yield line.rstrip("\r\n")
+
+
+def add_file(
+    c: Corpus, fn: str, progress: Progress | None = None, offset: int = 0
+) -> None:
+    """
+    Make the document of the CoNLL-U file fn (also used to build each file in its own process)
+    """
+    add_documents(c, read_file(fn, progress, offset))
+
+
+def process_files(
+    fns: list[str],
+    config: dict,
+    jobs: int = 1,
+    add_file: Callable = add_file,
+    format_name: str = "CoNLL-U",
+    cache_dir: str | None = None,
+) -> Corpus:
+    """
+    Create the corpus of the files fns, each file being added by add_file
+    (by default, as a CoNLL-U document)
+    With jobs > 1 the files are converted in parallel processes
+    With cache_dir, the conversion of each file is kept in cache_dir and only
+    the files whose name or content changed since the last run are converted again
+    """
     existing_files = [fn for fn in fns if os.path.isfile(fn)]
     total_files = len(existing_files)
 
-    progbar = tqdm(
-        total=total_files * 100,
-        desc=f"Processing {total_files} CoNLL-U files...",
-        unit_scale=True,
-        unit="byte",
+    file_sizes = [os.path.getsize(fn) for fn in existing_files]
+    progress = Progress(
+        sum(file_sizes), desc=f"Processing {total_files} {format_name} files..."
     )
 
-    def update_progress(desc: str, n: int):
-        progbar.n = n
-        progbar.set_description(desc, refresh=False)
-        progbar.refresh()
-
-    def read_lines() -> Iterator[str]:
-        for n_file, fn in enumerate(existing_files):
-            basename = os.path.basename(fn)
-            update_progress(
-                f"Processing {basename} ({n_file+1} / {total_files})", n_file * 100
-            )
-            file_size = os.path.getsize(fn)
-            with open(fn, "r", encoding="utf-8") as input:
-                tab_columns = "\t".join(CONLLU_COLUMNS)
-                yield f"# global.columns = {tab_columns}"
-                no_ext = Path(fn).stem
-                yield f"# newdoc id = {no_ext}"
-                chars_processed = 0
-                n_line = 1
-                while line := input.readline():
-                    chars_processed += len(line)
-                    update_progress(
-                        f"Processing {basename} ({n_file+1} / {total_files}); line {n_line}",
-                        n_file * 100
-                        + min(100, int(100.0 * chars_processed / file_size)),
-                    )
-                    yield line.rstrip("\r\n")
-                    n_line += 1
-        update_progress(f"All {total_files} files processed.", progbar.total)
-        progbar.close()
-
     corpus_name: str = (
-        Path(existing_files[0]).stem
+        Path(strip_compression(existing_files[0])).stem
         if len(existing_files) == 1
         else config.get("name", "Unnamed corpus")
     )
-    c = create_corpus(read_lines(), corpus_name, config)
+    if cache_dir is None and (jobs <= 1 or total_files <= 1):
+        c = Corpus(**corpus_kwargs(corpus_name, config))
+        bytes_done = 0
+        for n_file, fn in enumerate(existing_files):
+            basename = os.path.basename(fn)
+            progress.update(
+                bytes_done, f"Processing {basename} ({n_file+1} / {total_files})"
+            )
+            add_file(c, fn, progress, bytes_done)
+            bytes_done += file_sizes[n_file]
+    else:
+        c = build_sharded(
+            add_file,
+            existing_files,
+            workers=jobs,
+            callback=lambda n_files: progress.update(
+                sum(file_sizes[:n_files]), f"Processed {n_files} / {total_files} files"
+            ),
+            cache_dir=cache_dir,
+            shard_key=lambda fn: file_hash(fn, f"{format_name}:{os.path.basename(fn)}"),
+            **corpus_kwargs(corpus_name, config),
+        )
+    progress.close(sum(file_sizes), f"All {total_files} files processed.")
+    print("Corpus created")
     return c
@@ -2,14 +2,29 @@ import json
 import os
 import re
 
+from collections.abc import Callable
+
+from .builder import Corpus
 from .cli import _parse_cmd_line
 from .conllu_builder import process_files
-from .utils import default_json, find_config_file, yes_no_input
+from .utils import (
+    default_json,
+    find_config_file,
+    is_conll_file,
+    is_tei_file,
+    is_vert_file,
+    yes_no_input,
+)
+from .tei_builder import process_files as process_tei_files
+from .vert_builder import process_files as process_vert_files
+
+# the folder of the output directory where --incremental keeps each converted file
+CACHE_FOLDER = ".lcpcli_cache"
 
 ERROR_MSG = """
 Unrecognized input format.
 Note: The converter currently supports the following formats:
-.conllu, .conll
+.conllu, .conll, .vert, .vrt, .xml (TEI) (optionally compressed as .gz, .xz or .bz2)
 """
 
 
@@ -21,11 +36,15 @@ class Corpert:
         output=None,
         extension=None,
         combine=True,
+        jobs=1,
+        incremental=False,
         **kwargs,
     ):
         """
         path (str): path or string of content
         combine (bool): create single output file?
+        jobs (int): number of processes converting the input files
+        incremental (bool): only convert the input files that changed since the last run?
         """
         self.output = os.path.abspath(output) if output else None
         self._output_format = None
@@ -38,12 +57,14 @@ class Corpert:
         self._input_files = []
         self._path = os.path.normpath(content)
         self._combine = combine
+        self._jobs = jobs
+        self._incremental = incremental
         self._on_disk = True
         if os.path.isfile(content):
             self._input_files.append(content)
         elif os.path.isdir(content):
             # for root, dirs, files in os.walk(content):
-            for file in os.listdir(content):
+            for file in sorted(os.listdir(content)):
                 # for file in files:
                 # fullpath = os.path.join(root, file)
                 fullpath = os.path.join(content, file)
@@ -109,23 +130,34 @@ class Corpert:
             )
         ]
 
-        if (
-            not conll_only
-            and any(f.lower().endswith((".conllu", ".conll")) for f in doc_files)
-            and any(not f.lower().endswith((".conllu", ".conll")) for f in doc_files)
+        if conll_only:
+            doc_files = [f for f in doc_files if is_conll_file(f)]
+        elif any(is_conll_file(f) for f in doc_files) and any(
+            not is_conll_file(f) for f in doc_files
         ):
             print(
                 f"The input folder ({self._path}) contains both files with a CoNLL extension and files with a different extension."
             )
             print("Ignore the files with a non-CoNLL extension?")
             if yes_no_input():
-                doc_files = [
-                    f for f in doc_files if f.lower().endswith((".conll", ".conllu"))
-                ]
-
-        corpus = process_files(doc_files, json_obj.get("meta", {}))
+                doc_files = [f for f in doc_files if is_conll_file(f)]
+
+        # the converters take the same arguments, but not all of their options
+        process: Callable[..., Corpus]
+        if doc_files and all(is_vert_file(f) for f in doc_files):
+            process = process_vert_files
+        elif doc_files and all(is_tei_file(f) for f in doc_files):
+            process = process_tei_files
+        else:
+            process = process_files
+        cache_dir = (
+            os.path.join(self.output, CACHE_FOLDER) if self._incremental else None
+        )
+        corpus = process(
+            doc_files, json_obj.get("meta", {}), jobs=self._jobs, cache_dir=cache_dir
+        )
         print(f"Writing files to '{self.output}'...")
-        corpus.make(self.output)
+        corpus.make(self.output, workers=self._jobs)
 
         print(f"Output files written to '{self.output}'.")
         print(
@@ -18,12 +18,12 @@ from tusclient import client, uploader as tus_uploader
 
 import requests
 
-from tqdm import tqdm
 from math import ceil, log2
 
 from . import __version__
 from .check_files import Checker
 from .cli import _parse_cmd_line
+from .progress import Progress
 from .utils import (
     find_config_file,
     default_json,
@@ -75,6 +75,40 @@ class CustomTusClient(client.TusClient):
         return CustomUploader(*args, client=self, **kwargs)
 
 
+class CheckStats:
+    """
+    Row callback of the checks that counts the tokens and finds the text attributes
+    with values too long to be indexed; picklable so that the files can be checked
+    in parallel processes, whose stats are then merged
+    """
+
+    def __init__(self, template_data: dict):
+        self.token_prefix = template_data["firstClass"]["token"].lower() + "."
+        self.text_attrs: list[tuple[str, str]] = [
+            (lay, attr)
+            for lay, props in template_data["layer"].items()
+            for attr in {
+                aname
+                for aname, ameta in props.get("attributes", {}).items()
+                if ameta.get("type") == "text"
+            }
+        ]
+        self.n_tokens = 0
+        self.no_index: set[tuple[str, str]] = set()
+
+    def __call__(self, c: list[str], h: list[str], f: str, *_) -> None:
+        if f.startswith(self.token_prefix):
+            self.n_tokens += 1
+        for lay, attr in self.text_attrs:
+            if f.startswith(f"{lay}_{attr}.".lower()) and len(c[h.index(attr)]) > 2000:
+                self.no_index.add((lay, attr))
+                break
+
+    def merge(self, other: CheckStats) -> None:
+        self.n_tokens += other.n_tokens
+        self.no_index |= other.no_index
+
+
 def post(*args, **kwargs):
     if "files" in kwargs:
         size = sum(os.path.getsize(f.name) for f in kwargs["files"].values())
@@ -100,6 +134,7 @@ def lcp_upload(
     escape: str = "",
     force_corpus_overwrite: bool = False,
     skip_check: bool = False,
+    jobs: int = 1,
 ) -> None:
 
     filt = None
@@ -199,29 +234,7 @@ def lcp_upload(
             )
 
     checker = Checker(template_data, quote=quote, delimiter=delimiter, escape=escape)
-    text_attrs: list[tuple[str, str]] = [
-        (lay, attr)
-        for lay, props in template_data["layer"].items()
-        for attr in {
-            aname
-            for aname, ameta in props.get("attributes", {}).items()
-            if ameta.get("type") == "text"
-        }
-    ]
-    no_index: set[tuple[str, str]] | list[list[str]] = set()
-    no_index_callback: Callable = lambda c, h, f, *_: cast(
-        set[tuple[str, str]], no_index
-    ).add(
-        next(
-            (
-                (lay, attr)
-                for lay, attr in text_attrs
-                if f.startswith(f"{lay}_{attr}.".lower())
-                and len(c[h.index(attr)]) > 2000
-            ),
-            ("", ""),
-        )
-    )
+    no_index: list[list[str]] = []
     if is_zip:
         print(
             "Warning: not running checks on archives. Un-archive the corpus if you want to run checks."
@@ -235,17 +248,12 @@ def lcp_upload(
             "Some optimization procedures only apply when checking the corpus; skipping the checks might produced a sub-optimized corpus."
         )
     else:
-        tok = template_data["firstClass"]["token"]
-        n_tokens = {"n": 0}
-        n_tokens_callback: Callable = lambda c, h, f, *_: n_tokens.__setitem__(
-            "n", n_tokens["n"] + (1 if f.startswith(tok.lower() + ".") else 0)
+        stats = CheckStats(template_data)
+        checker.run_checks(
+            base, full=True, add_zero=False, callback=stats, workers=jobs
         )
-        callback: Callable = lambda c, h, f, *_: n_tokens_callback(
-            c, h, f, *_
-        ) or no_index_callback(c, h, f, *_)
-        checker.run_checks(base, full=True, add_zero=False, callback=callback)
-        n_batches = max(1, ceil(log2(n_tokens["n"] / 1e6)))
-        no_index = [[lay, attr] for lay, attr in no_index if lay and attr]
+        n_batches = max(1, ceil(log2(stats.n_tokens / 1e6)))
+        no_index = [[lay, attr] for lay, attr in sorted(stats.no_index)]
 
     headers: dict[str, str | None] = {
         "Content-Type": None,
@@ -669,7 +677,7 @@ def monitor_db_insert(
     """
     status = None
     wait = 8
-    progbar: tqdm | None = None
+    progbar: Progress | None = None
     total: int | float | None = None
     bads: set[str] = {"finished", "failed"}
     unit: str = "byte"
@@ -685,10 +693,7 @@ def monitor_db_insert(
         status = data["status"]
         if status in bads:
             if progbar and total and status == "finished":
-                progbar.n = progbar.total
-                progbar.set_description("Tidying up", refresh=False)
-                progbar.refresh()
-                progbar.close()
+                progbar.close(progbar.total, "Tidying up")
                 print(f"Status: {status}")
             elif status == "failed":
                 print(f"Status: {status}")
@@ -712,19 +717,13 @@ def monitor_db_insert(
         if not total and tot:
             total = tot
         if not progbar and total:
-            progbar = tqdm(total=total, desc=stat, unit_scale=True, unit=unit, ncols=80)
+            progbar = Progress(total, desc=stat, unit=unit, ncols=80)
         if progbar is not None and current and tot != total and unit == "task":
-            progbar.n = progbar.total
-            progbar.refresh()
-            progbar.close()
+            progbar.close(progbar.total)
             total = tot
-            progbar = tqdm(
-                total=total, desc=stat, unit_scale=False, unit=unit, ncols=80
-            )
+            progbar = Progress(total, desc=stat, unit=unit, unit_scale=False, ncols=80)
         elif progbar is not None and current and tot == total:
-            progbar.n = current
-            progbar.set_description(stat, refresh=False)
-            progbar.refresh()
+            progbar.update(current, stat)
 
         time.sleep(wait)
     if progbar:
@@ -0,0 +1,69 @@
+import sys
+import time
+
+from tqdm import tqdm
+
+UPDATES_PER_SECOND = 4
+
+
+class Progress:
+    """
+    Progress bar redrawn at most updates_per_second times per second
+    Disabled when stderr is not a terminal or when Progress.quiet is set
+    """
+
+    quiet: bool = False
+
+    def __init__(
+        self,
+        total: int | float,
+        desc: str = "",
+        unit: str = "byte",
+        unit_scale: bool = True,
+        updates_per_second: float = UPDATES_PER_SECOND,
+        **kwargs,
+    ):
+        self.total = total
+        self.desc = desc
+        self.interval = 1.0 / updates_per_second
+        self.next_update = 0.0
+        self.bar: tqdm | None = None
+        if not Progress.quiet and sys.stderr.isatty():
+            self.bar = tqdm(
+                total=total, desc=desc, unit=unit, unit_scale=unit_scale, **kwargs
+            )
+
+    def due(self) -> bool:
+        """
+        Whether the bar would be redrawn now (cheap enough to call for every line)
+        """
+        return self.bar is not None and time.monotonic() >= self.next_update
+
+    def update(self, n: int | float, desc: str | None = None, force: bool = False):
+        """
+        Move the bar to n and set its description, redrawing it only if due
+        """
+        if desc is not None:
+            self.desc = desc
+        if self.bar is None or not (force or self.due()):
+            return
+        self.next_update = time.monotonic() + self.interval
+        self.bar.n = n
+        self.bar.set_description(self.desc, refresh=False)
+        self.bar.refresh()
+
+    def write(self, message: str) -> None:
+        if self.bar is None:
+            print(message)
+        else:
+            self.bar.write(message)
+
+    def close(self, n: int | float | None = None, desc: str | None = None):
+        """
+        Draw the bar one last time (at n if provided) and close it
+        """
+        if self.bar is None:
+            return
+        self.update(self.bar.n if n is None else n, desc, force=True)
+        self.bar.close()
+        self.bar = None
@@ -0,0 +1,252 @@
+import os
+
+from xml.etree.ElementTree import Element, iterparse
+
+from lcpcli.builder import *
+from lcpcli.conllu_builder import process_files as process_conllu_files, to_value
+from lcpcli.progress import Progress
+from lcpcli.utils import open_input
+
+# LCP convention
+FRAMES_PER_SECOND = 25
+TIME_UNITS = {"s": 1.0, "ms": 0.001}
+TOKEN_TAGS = ("w", "pc")
+# elements whose text is read when they end, so their children are kept until then
+TEXT_TAGS = (*TOKEN_TAGS, "title")
+# the renamed attributes of the elements that map onto layers
+RENAMES = {
+    "TEI": {"id": "docid"},
+    "p": {"id": "parid"},
+    "u": {"id": "sent"},
+    "s": {"id": "sent"},
+}
+
+
+def local_name(name: str) -> str:
+    """Remove the namespace from a tag or attribute name, ie. {ns}id -> id"""
+    return name.rpartition("}")[2]
+
+
+def element_attributes(elem: Element, renames: dict[str, str] = {}) -> dict:
+    """The attributes of elem that can be layer attributes, without their namespaces"""
+    ret = {}
+    for k, v in elem.attrib.items():
+        k = renames.get(local_name(k), local_name(k))
+        if IS_ATTRIBUTE_NAME.match(k):
+            ret[k] = to_value(v.strip().lstrip("#"))
+    return ret
+
+
+class Timeline:
+    """The time points of a <timeline>, in seconds from its origin"""
+
+    def __init__(self, unit: str = "s"):
+        self.factor = TIME_UNITS.get(unit, 1.0)
+        # time point id -> (since, interval) until resolved, then seconds
+        self.points: dict[str, tuple[str, float] | float] = {}
+
+    def add(self, elem: Element):
+        attrs = {local_name(k): v for k, v in elem.attrib.items()}
+        point_id = attrs.get("id", "").lower()
+        if "absolute" in attrs:
+            self.points[point_id] = float(attrs["absolute"]) * self.factor
+        elif "interval" in attrs:
+            since = attrs.get("since", "").lstrip("#").lower()
+            self.points[point_id] = (since, float(attrs["interval"]) * self.factor)
+        else:
+            self.points[point_id] = 0.0
+
+    def seconds(self, point_id: str) -> float | None:
+        """
+        The time of point_id (case-insensitive), following the 'since' references
+        """
+        point_id = point_id.lstrip("#").lower()
+        point = self.points.get(point_id)
+        if point is None or isinstance(point, float):
+            return point
+        since, interval = point
+        # mark the point as being resolved in case the references loop
+        self.points[point_id] = interval
+        offset = self.seconds(since) or 0.0
+        self.points[point_id] = offset + interval
+        return offset + interval
+
+
+def add_documents(
+    c: Corpus,
+    source: Any,
+    progress: Progress | None = None,
+    raw: Any = None,
+    offset: int = 0,
+) -> None:
+    """
+    Make the documents of the TEI XML file object source (one per <TEI> element)
+    The XML is parsed incrementally: each element is cleared as soon as it has been
+    processed and only the current segment is kept in the builder
+    progress is moved to offset + raw.tell() if provided
+    """
+    # open elements, from the root
+    stack: list[Element] = []
+    in_text = 0
+    in_text_tag = 0
+    doc_attrs: dict = {}
+    media: tuple[str, str, str | None] | None = None
+    timeline = Timeline()
+    time_offset = c._frame_counter
+    # attributes and times of the open <p>/<u>/<s>, and their layers once created
+    opened: dict[str, dict | None] = {"p": None, "u": None, "s": None}
+    times: dict[str, tuple[int, int] | None] = {"u": None, "s": None}
+    layers: dict[str, Layer | None] = {"TEI": None, "p": None, "segment": None}
+
+    def get_layer(name: str) -> Layer:
+        entity = layers[name]
+        if entity is not None:
+            return entity
+        if name == "TEI":
+            if media:
+                # documents with media are listed by name
+                doc_attrs.setdefault("name", doc_attrs.get("docid", ""))
+            entity = c.Document(**doc_attrs)
+            if media:
+                entity.set_media(*media)
+        elif name == "p":
+            entity = get_layer("TEI").Paragraph(**(opened["p"] or {}))
+        else:
+            parent = get_layer("p") if opened["p"] is not None else get_layer("TEI")
+            # <s> inside a <u>: the segments are the sentences, with the speaker
+            attrs = {**(opened["u"] or {}), **(opened["s"] or {})}
+            entity = parent.Segment(**attrs)
+            time = times["s"] or times["u"]
+            if time:
+                entity.set_time(*time)
+        layers[name] = entity
+        return entity
+
+    def close(name: str) -> None:
+        entity = layers[name]
+        if entity is not None:
+            entity.make(clear=True)
+            if name != "p":
+                time = entity.get_time()
+                if time:
+                    c._frame_counter = max(c._frame_counter, time[1])
+        layers[name] = None
+
+    def frames(elem: Element) -> tuple[int, int] | None:
+        start, end = (
+            next((v for k, v in elem.attrib.items() if local_name(k) == x), None)
+            for x in ("start", "end")
+        )
+        if start is None or end is None:
+            return None
+        start_s, end_s = timeline.seconds(start), timeline.seconds(end)
+        if start_s is None or end_s is None:
+            return None
+        low = time_offset + int(start_s * FRAMES_PER_SECOND)
+        high = time_offset + int(end_s * FRAMES_PER_SECOND)
+        return (low, max(high, low + 1))
+
+    try:
+        for event, elem in iterparse(source, events=("start", "end")):
+            tag = local_name(elem.tag)
+            if event == "start":
+                stack.append(elem)
+                if tag in TEXT_TAGS:
+                    in_text_tag += 1
+                if tag == "TEI":
+                    doc_attrs = element_attributes(elem, RENAMES["TEI"])
+                    media = None
+                    time_offset = c._frame_counter
+                elif tag == "text":
+                    in_text += 1
+                elif tag == "timeline":
+                    unit = next(
+                        (v for k, v in elem.attrib.items() if local_name(k) == "unit"),
+                        "s",
+                    )
+                    timeline = Timeline(unit)
+                elif in_text and tag in opened:
+                    if tag in ("p", "u"):
+                        close("segment")
+                    if tag == "p":
+                        close("p")
+                    elif tag == "s" and layers["segment"] is not None:
+                        # tokens directly in <u> before this <s>
+                        close("segment")
+                    opened[tag] = attrs = element_attributes(elem, RENAMES[tag])
+                    if tag in times:
+                        times[tag] = frames(elem)
+                        attrs.pop("start", None)
+                        attrs.pop("end", None)
+                continue
+
+            stack.pop()
+            if tag in TEXT_TAGS:
+                in_text_tag -= 1
+            if tag in TOKEN_TAGS:
+                if in_text and not in_text_tag:
+                    form = "".join(elem.itertext()).strip()
+                    if form:
+                        attrs = element_attributes(elem)
+                        attrs.pop("id", None)
+                        if attrs.pop("join", "") in ("right", "both"):
+                            attrs["spaceAfter"] = 0
+                        get_layer("segment").Token(form, **attrs)
+                        if progress and raw is not None and progress.due():
+                            progress.update(offset + raw.tell())
+            elif tag == "title" and "title" not in doc_attrs and not in_text:
+                title = "".join(elem.itertext()).strip()
+                if title:
+                    doc_attrs["title"] = title
+            elif tag == "media" and media is None:
+                attrs = {local_name(k): v for k, v in elem.attrib.items()}
+                if url := attrs.get("url"):
+                    media_type = attrs.get("mimeType", "").partition("/")[0] or None
+                    media = (media_type or "audio", os.path.basename(url), media_type)
+            elif tag == "when":
+                timeline.add(elem)
+            elif tag == "text":
+                in_text -= 1
+            elif tag == "TEI":
+                close("segment")
+                close("p")
+                close("TEI")
+            elif in_text and tag in opened:
+                if tag in ("u", "s"):
+                    close("segment")
+                else:
+                    close("p")
+                opened[tag] = None
+                if tag in times:
+                    times[tag] = None
+            if in_text_tag:
+                # the text of the enclosing token or title is read when it ends
+                continue
+            elem.clear()
+            if stack and len(stack[-1]) and stack[-1][-1] is elem:
+                del stack[-1][-1]
+    except Exception as e:
+        raise RuntimeError(f"""Error when creating the corpus:
+            {str(e)}
+            Are all input files valid TEI files?""")
+
+
+def add_file(
+    c: Corpus, fn: str, progress: Progress | None = None, offset: int = 0
+) -> None:
+    """
+    Make the document of the TEI file fn (also used to build each file in its own process)
+    """
+    with open_input(fn) as (input, raw):
+        add_documents(c, input.buffer, progress, raw, offset)
+
+
+def process_files(
+    fns: list[str], config: dict, jobs: int = 1, cache_dir: str | None = None
+) -> Corpus:
+    """
+    Create the corpus of the TEI files fns
+    With jobs > 1 the files are converted in parallel processes
+    With cache_dir, only the files that changed since the last run are converted
+    """
+    return process_conllu_files(fns, config, jobs, add_file, "TEI", cache_dir)
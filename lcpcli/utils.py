@@ -1,13 +1,41 @@
+import bz2
 import diskcache
+import gzip
+import hashlib
+import io
 import json
+import lzma
 import os
 import re
+import shutil
+import sys
+import tempfile
+import weakref
 
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import date
+from functools import lru_cache
 from jsonschema import validate
 from pathlib import Path
+from typing import BinaryIO, TextIO, cast
 
 COMPRESSED_EXTENSIONS = ("zip", "tar", "tar.gz", "tar.xz", "7z")
+CONLL_EXTENSIONS = (".conllu", ".conll")
+VERT_EXTENSIONS = (".vert", ".vrt")
+TEI_EXTENSIONS = (".xml", ".tei")
+# single-file compressions that can be decompressed while reading
+STREAM_COMPRESSIONS = {
+    ".gz": lambda f: gzip.GzipFile(fileobj=f, mode="rb"),
+    ".xz": lambda f: lzma.LZMAFile(f, mode="rb"),
+    ".bz2": lambda f: bz2.BZ2File(f, mode="rb"),
+}
+COMPRESSION_MAGIC = {b"\x1f\x8b": ".gz", b"\xfd7zXZ\x00": ".xz", b"BZh": ".bz2"}
+DEFAULT_SPILL_BYTES = 2 * 1024**3
+COPY_BUFSIZE = 1024 * 1024
+# approximate cost of a dict slot and of the reference to the key/value
+ENTRY_OVERHEAD_BYTES = 100
+MISSING = object()
 
 
 def get_file_from_base(fn: str, files: list[str]) -> str:
@@ -34,13 +62,35 @@ def esc(
     double: bool = True,
     escape_backslash: bool = False,
 ) -> str:
-    return (
-        str(value)
-        .replace("'", "''" if double else "'")
-        .replace("\\n", "")
-        .replace("\\", "\\\\" if escape_backslash else "\\")
-        .replace(quote, quote + quote)
-    )
+    table = _esc_table(quote, double, escape_backslash)
+    return str(value).replace("\\n", "").translate(table)
+
+
+@lru_cache(maxsize=None)
+def _esc_table(quote: str, double: bool, escape_backslash: bool) -> dict[int, str]:
+    """
+    Translation table applying in one pass the same replacements as chaining
+    str.replace for single quotes, backslashes and quote
+    """
+    table: dict[int, str] = {}
+    for char in {"'", "\\", quote}:
+        escaped = char.replace("'", "''" if double else "'")
+        escaped = escaped.replace("\\", "\\\\" if escape_backslash else "\\")
+        escaped = escaped.replace(quote, quote + quote)
+        if escaped != char:
+            table[ord(char)] = escaped
+    return table
+
+
+def move_file(source: str, destination: str) -> None:
+    """
+    Rename source to destination, or copy it over if they are on different filesystems
+    """
+    try:
+        os.replace(source, destination)
+    except OSError:
+        shutil.copy(source, destination)
+        os.remove(source)
 
 
 def sorted_dict(d: dict) -> dict:
@@ -79,50 +129,203 @@ def find_config_file(path: str) -> str:
     return config_file_ref
 
 
+def strip_compression(fn: str) -> str:
+    """Remove the extension of a stream compression, ie. x.conllu.gz -> x.conllu"""
+    base, ext = os.path.splitext(fn)
+    return base if ext.lower() in STREAM_COMPRESSIONS else fn
+
+
+def file_hash(fn: str, salt: str = "") -> str:
+    """The SHA-256 hex digest of salt followed by the content of the file fn"""
+    digest = hashlib.sha256(salt.encode("utf-8"))
+    with open(fn, "rb") as f:
+        while chunk := f.read(COPY_BUFSIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_conll_file(fn: str) -> bool:
+    return strip_compression(fn).lower().endswith(CONLL_EXTENSIONS)
+
+
+def is_vert_file(fn: str) -> bool:
+    return strip_compression(fn).lower().endswith(VERT_EXTENSIONS)
+
+
+def is_tei_file(fn: str) -> bool:
+    return strip_compression(fn).lower().endswith(TEI_EXTENSIONS)
+
+
+@contextmanager
+def open_input(fn: str, encoding: str = "utf-8") -> Iterator[tuple[TextIO, BinaryIO]]:
+    """
+    Open fn for reading text, decompressing it on the fly if it is compressed
+    (guessed from its extension, or else from its first bytes)
+    Also yields the underlying file, whose tell() is the number of bytes consumed
+    """
+    with open(fn, "rb") as raw:
+        ext = os.path.splitext(fn)[1].lower()
+        if ext not in STREAM_COMPRESSIONS:
+            head = raw.peek(6)[:6]
+            ext = next(
+                (e for m, e in COMPRESSION_MAGIC.items() if head.startswith(m)), ""
+            )
+        stream = cast(BinaryIO, STREAM_COMPRESSIONS[ext](raw) if ext else raw)
+        with io.TextIOWrapper(stream, encoding=encoding) as input:
+            yield (input, raw)
+
+
 def yes_no_input(prompt: str = "Type YES/Y/yes/y or NO/N/no/n: ") -> bool:
     return re.match(r"(no|n)", input(prompt), re.IGNORECASE) is None
 
 
-class SpillDict:
-    max_in_memory_items = 9999999
-    overall_size = 0
-    reached = False
+class SpillStore:
+    """
+    Memory budget (in bytes) shared by several SpillDict's, which spill their
+    least recently used entries to on-disk caches when it is exceeded, one per
+    SpillDict in a common directory that is deleted on close (or when the store
+    is collected)
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_SPILL_BYTES):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.reached = False
+        self.lookups: list["SpillDict"] = []
+        self._directory: str | None = None
+        self._caches: list[diskcache.Cache] = []
+        self._finalizer: weakref.finalize | None = None
 
-    def __init__(self):
-        self.in_memory = {}
-        self.dc = diskcache.Cache()
+    @property
+    def directory(self) -> str:
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix="lcpcli_spill_")
+            self._finalizer = weakref.finalize(
+                self, _remove_caches, self._caches, self._directory
+            )
+        return self._directory
+
+    def disk_cache(self) -> diskcache.Cache:
+        """A new on-disk cache in the directory of the store"""
+        cache = diskcache.Cache(os.path.join(self.directory, str(len(self._caches))))
+        self._caches.append(cache)
+        return cache
+
+    def lookup(self) -> "SpillDict":
+        return SpillDict(self)
+
+    def spill(self) -> None:
+        """Move cold entries to disk until 90% of the budget is free again"""
+        if not self.reached:
+            print("Reached the memory limit for lookups, using disk storage now")
+            self.reached = True
+        target = int(self.max_bytes * 0.9)
+        for only_cold in (True, False):
+            for lookup in sorted(self.lookups, key=lambda l: -l.bytes):
+                if self.used <= target:
+                    return
+                lookup._spill(target, only_cold)
+
+    def close(self) -> None:
+        if self._finalizer is not None:
+            self._finalizer()
+        self._directory = None
+        self._caches = []
+        self._finalizer = None
+        self.used = 0
+        for lookup in self.lookups:
+            lookup._cache = None
+            lookup.in_memory = {}
+            lookup.recent = set()
+            lookup.bytes = 0
+            lookup.size = 0
+        self.lookups = []
+
+
+def _remove_caches(caches: list[diskcache.Cache], directory: str) -> None:
+    for cache in caches:
+        cache.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def _entry_bytes(key, value) -> int:
+    return sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD_BYTES
+
+
+class SpillDict:
+    """
+    Dict-like lookup whose entries live in memory until its SpillStore runs
+    out of budget; spilled entries are stored in its own cache on disk
+    """
+
+    def __init__(self, store: SpillStore | None = None):
+        self.store = store or SpillStore()
+        self.in_memory: dict = {}
+        # keys accessed since the last spill, only tracked once the budget was reached
+        self.recent: set = set()
+        self.bytes = 0
         self.size = 0
+        self.on_disk = 0
+        self._cache: diskcache.Cache | None = None
+        self.store.lookups.append(self)
 
-    def __del__(self):
-        pass
+    @property
+    def cache(self) -> diskcache.Cache:
+        if self._cache is None:
+            self._cache = self.store.disk_cache()
+        return self._cache
+
+    def _spill(self, target: int, only_cold: bool) -> None:
+        store = self.store
+        cache = self.cache
+        for key in list(self.in_memory):
+            if store.used <= target:
+                break
+            if only_cold and key in self.recent:
+                continue
+            value = self.in_memory.pop(key)
+            cache[key] = value
+            nbytes = _entry_bytes(key, value)
+            self.bytes -= nbytes
+            store.used -= nbytes
+            self.on_disk += 1
+        self.recent = set()
+
+    def _add_in_memory(self, key, value) -> None:
+        self.in_memory[key] = value
+        nbytes = _entry_bytes(key, value)
+        self.bytes += nbytes
+        self.store.used += nbytes
+        if self.store.used > self.store.max_bytes:
+            self.recent.add(key)
+            self.store.spill()
+
+    def _pop_from_disk(self, key):
+        if not self.on_disk:
+            return MISSING
+        value = self.cache.pop(key, MISSING)
+        if value is not MISSING:
+            self.on_disk -= 1
+        return value
 
     def __setitem__(self, key, value):
-        if key in self.in_memory:
-            self.in_memory[key] = value
-            return
-        if self.dc and key in self.dc:
-            self.dc[key] = value
-            return
-        if SpillDict.overall_size < SpillDict.max_in_memory_items:
-            self.in_memory[key] = value
-        else:
-            if not SpillDict.reached:
-                print("Reached the limit, using disk storage now")
-                SpillDict.reached = True
-            self.dc[key] = value
-        self.size += 1
-        SpillDict.overall_size += 1
+        current = self.in_memory.pop(key, MISSING)
+        if current is not MISSING:
+            nbytes = _entry_bytes(key, current)
+            self.bytes -= nbytes
+            self.store.used -= nbytes
+        elif self._pop_from_disk(key) is MISSING:
+            self.size += 1
+        self._add_in_memory(key, value)
 
     def __getitem__(self, key):
-        if key in self.in_memory:
-            return self.in_memory[key]
-        else:
-            return self.dc[key]
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
 
     def __eq__(self, other):
-        if not isinstance(other, SpillDict):
-            return False
-        return self == other
+        return self is other
 
     def __len__(self):
         return self.size
@@ -131,44 +334,50 @@ class SpillDict:
         return self.size > 0
 
     def __contains__(self, key) -> bool:
-        return key in self.in_memory or key in self.dc
+        return key in self.in_memory or (self.on_disk > 0 and key in self.cache)
 
     def __iter__(self):
-        for k in self.in_memory:
-            yield k
-        for k in self.dc:
-            yield k
+        yield from self.keys()
+
+    def _disk_items(self):
+        if not self.on_disk:
+            return
+        cache = self.cache
+        for key in cache:
+            yield (key, cache[key])
 
     def items(self):
-        for k in self.in_memory:
-            yield (k, self.in_memory[k])
-        for k in self.dc:
-            yield (k, self.dc[k])
+        yield from self.in_memory.items()
+        yield from self._disk_items()
 
     def setdefault(self, key, value):
-        if key not in self.in_memory and key not in self.dc:
-            self.__setitem__(key, value)
-        return self.__getitem__(key)
+        current = self.get(key, MISSING)
+        if current is not MISSING:
+            return current
+        self.__setitem__(key, value)
+        return value
 
     def keys(self):
-        for k in self.in_memory:
-            yield k
-        for k in self.dc:
+        for k, _ in self.items():
             yield k
 
     def values(self):
-        for k in self.in_memory:
-            yield self.in_memory[k]
-        for k in self.dc:
-            yield self.dc[k]
-
-    def get(self, key: str, default=None):
-        val = default
-        try:
-            val = self.__getitem__(key)
-        except:
-            pass
-        return val
+        for _, v in self.items():
+            yield v
+
+    def get(self, key, default=None):
+        value = self.in_memory.get(key, MISSING)
+        if value is not MISSING:
+            if self.store.reached:
+                self.recent.add(key)
+            return value
+        value = self._pop_from_disk(key)
+        if value is MISSING:
+            return default
+        # bring the entry back in memory: it is hot again
+        self._add_in_memory(key, value)
+        self.recent.add(key)
+        return value
 
 
 # Compute left/right from parent only once
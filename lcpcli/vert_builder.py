@@ -0,0 +1,144 @@
+import re
+
+from collections.abc import Iterable, Iterator
+from xml.sax.saxutils import unescape
+
+from lcpcli.builder import *
+from lcpcli.conllu_builder import process_files as process_conllu_files, to_value
+from lcpcli.progress import Progress
+from lcpcli.utils import open_input
+
+# Names of the positional attributes (tab-separated columns) of the token lines
+VERT_COLUMNS = ("form", "lemma", "pos")
+# Structures that map onto layers: the layer and the renamed structure attributes
+STRUCTURES = {
+    "doc": ("Document", {"id": "docid"}),
+    "text": ("Document", {"id": "docid"}),
+    "p": ("Paragraph", {"id": "parid"}),
+    "s": ("Segment", {"id": "sent", "sent_id": "sent"}),
+}
+TAG_LINE = re.compile(
+    r"<(/?)([A-Za-z_][\w.-]*)((?:\s+[^\s=/>]+\s*=\s*(?:\"[^\"]*\"|'[^']*'))*)\s*(/?)>$"
+)
+TAG_ATTRIBUTE = re.compile(r"([^\s=]+)\s*=\s*(?:\"([^\"]*)\"|'([^']*)')")
+XML_ENTITIES = {"&quot;": '"', "&apos;": "'"}
+
+
+def structure_attributes(attributes: str, renames: dict[str, str]) -> dict:
+    """Converts a string like ' id="x" year="2000"' into a dict like {docid:x,year:2000}"""
+    return {
+        renames.get(k, k): to_value(unescape(v1 or v2, XML_ENTITIES).strip())
+        for k, v1, v2 in TAG_ATTRIBUTE.findall(attributes)
+    }
+
+
+def add_documents(
+    c: Corpus, input: Iterable[str], columns: Iterable[str] = VERT_COLUMNS
+) -> None:
+    """
+    Make the documents of the VERT lines in input
+    Structures are only created once they contain a token, and segments are made
+    (and cleared) as soon as they are closed, so only the current segment is in memory
+    """
+    column_names = list(columns)
+    # the attributes of the open structures, and their layers once created
+    opened: dict[str, dict | None] = {layer: None for layer, _ in STRUCTURES.values()}
+    layers: dict[str, Layer | None] = {layer: None for layer in opened}
+    last_token: Layer | None = None
+
+    def get_layer(layer: str) -> Layer:
+        entity = layers[layer]
+        if entity is not None:
+            return entity
+        if layer == "Document":
+            entity = c.Document(**(opened[layer] or {}))
+        elif layer == "Segment":
+            parent = layers["Paragraph"]
+            if parent is None and opened["Paragraph"] is not None:
+                parent = get_layer("Paragraph")
+            parent = parent or get_layer("Document")
+            entity = parent.Segment(**(opened[layer] or {}))
+        else:
+            entity = get_layer("Document").Paragraph(**(opened[layer] or {}))
+        layers[layer] = entity
+        return entity
+
+    def close(layer: str) -> None:
+        nonlocal last_token
+        # closing a structure closes the structures it contains
+        for inner in ("Segment", "Paragraph", "Document"):
+            entity = layers[inner]
+            if entity is not None:
+                entity.make(clear=True)
+            layers[inner] = None
+            opened[inner] = None
+            if inner == layer:
+                break
+        last_token = None
+
+    try:
+        for line in input:
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] == "<" and (m := TAG_LINE.match(line)):
+                closing, tag, attributes, self_closing = m.groups()
+                if tag == "g":
+                    # glue: no space between the previous token and the next one
+                    if last_token is not None:
+                        last_token.spaceAfter = 0
+                    continue
+                if tag not in STRUCTURES:
+                    continue
+                layer, renames = STRUCTURES[tag]
+                if not closing:
+                    close(layer)
+                    opened[layer] = structure_attributes(attributes, renames)
+                if closing or self_closing:
+                    close(layer)
+                continue
+            # Past the structures: the line is a token
+            form, *rest = line.split("\t")
+            kwargs = {x: to_value(v) for x, v in zip(column_names[1:], rest) if v != ""}
+            for n, v in enumerate(rest[len(column_names) - 1 :], len(column_names)):
+                kwargs[f"col{n+1}"] = to_value(v)
+            last_token = get_layer("Segment").Token(form, **kwargs)
+        close("Document")
+    except Exception as e:
+        raise RuntimeError(f"""Error when creating the corpus:
+            {str(e)}
+            Are all input files valid VERT files?""")
+
+
+def read_file(
+    fn: str, progress: Progress | None = None, offset: int = 0
+) -> Iterator[str]:
+    """
+    Yield the lines of the VERT file fn (possibly compressed)
+    progress is moved to offset + the number of bytes read from fn
+    """
+    with open_input(fn) as (input, raw):
+        for line in input:
+            if progress and progress.due():
+                progress.update(offset + raw.tell())
+            yield line
+
+
+def add_file(
+    c: Corpus, fn: str, progress: Progress | None = None, offset: int = 0
+) -> None:
+    """
+    Make the documents of the VERT file fn (also used to build each file in its own process)
+    """
+    add_documents(c, read_file(fn, progress, offset))
+
+
+def process_files(
+    fns: list[str], config: dict, jobs: int = 1, cache_dir: str | None = None
+) -> Corpus:
+    """
+    Create the corpus of the VERT files fns
+    With jobs > 1 the files are converted in parallel processes
+    With cache_dir, only the files that changed since the last run are converted
+    """
+    return process_conllu_files(fns, config, jobs, add_file, "VERT", cache_dir)
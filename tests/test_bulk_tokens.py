@@ -0,0 +1,121 @@
+import json
+import os
+import re
+import shutil
+import pytest
+
+from lcpcli.builder import *
+from lcpcli.check_files import Checker
+
+TMP_FOLDER = os.path.join(os.path.dirname(__file__), "tmp_data")
+UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def token_columns(ns: int) -> dict[str, list]:
+    return {
+        "form": [f"form{nt}" for nt in range(ns + 2)],
+        "lemma": [f"lemma{nt % 3}" for nt in range(ns + 2)],
+        "pos": ["NOUN" if nt % 2 else "VERB" for nt in range(ns + 2)],
+        "score": [nt / 2 if ns else nt for nt in range(ns + 2)],
+        "tags": [[f"T{nt % 3}"] for nt in range(ns + 2)],
+        "misc": [{"n": str(nt)} for nt in range(ns + 2)],
+    }
+
+
+def build_corpus(folder: str, bulk: bool, **kwargs) -> None:
+    c = Corpus("my test corpus", **kwargs)
+    for nd in range(2):
+        d = c.Document(name=f"Document {nd}")
+        for ns in range(3):
+            columns = token_columns(ns)
+            s = d.Segment(speaker=f"S{ns % 2}")
+            if bulk:
+                ids = s.Token.bulk(**columns)
+                assert len(ids) == len(columns["form"])
+            else:
+                for values in zip(*columns.values()):
+                    s.Token(*values[:1], **dict(zip(list(columns)[1:], values[1:])))
+            s.make()
+        d.make()
+    c.make(folder)
+
+
+@pytest.mark.parametrize("fts", ["inline", "deferred"])
+def test_bulk_tokens(fts):
+    """Test that making tokens in bulk gives the same files as one by one."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    single_folder = os.path.join(TMP_FOLDER, "single")
+    bulk_folder = os.path.join(TMP_FOLDER, "bulk")
+    os.makedirs(single_folder, exist_ok=True)
+    os.makedirs(bulk_folder, exist_ok=True)
+    build_corpus(single_folder, bulk=False, fts=fts)
+    build_corpus(bulk_folder, bulk=True, fts=fts)
+    for fn in sorted(os.listdir(single_folder)):
+        with open(os.path.join(single_folder, fn)) as single:
+            with open(os.path.join(bulk_folder, fn)) as bulk:
+                # segment ids are random
+                assert UUID.sub("", single.read()) == UUID.sub("", bulk.read()), fn
+    # Validate the generated files
+    conf = json.loads(open(os.path.join(bulk_folder, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(bulk_folder, full=True, add_zero=False)
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_bulk_tokens_errors():
+    """Test the columns that cannot be made in bulk."""
+    c = Corpus("my test corpus")
+    s = c.Segment()
+    with pytest.raises(AssertionError):
+        s.Token.bulk(lemma=["a"])
+    with pytest.raises(AssertionError):
+        s.Token.bulk(form=["a", "b"], lemma=["a"])
+    with pytest.raises(AssertionError):
+        s.Phrase.bulk(form=["a"])
+    schema = {"Token": {"attributes": {"misc": {"type": "dict"}}}}
+    s = Corpus("my test corpus", schema=schema).Segment()
+    with pytest.raises(AssertionError, match="is a dict, got 'a=b'"):
+        s.Token.bulk(form=["a", "b"], misc=[{"a": "b"}, "a=b"])
+
+
+def test_bulk_tokens_numpy():
+    """Test making tokens in bulk from NumPy arrays."""
+    np = pytest.importorskip("numpy")
+    c = Corpus("my test corpus")
+    s = c.Segment()
+    s.Token.bulk(form=np.array(["a", "b"]), num=np.array([1, 2]))
+    s.make()
+    assert c._layers["Token"].attributes["num"]["type"] == "number"
+    assert s.get_char() == [0, 4]
+
+
+def test_bulk_tokens_linebreaks():
+    """Test that the linebreaks are removed from the values made in bulk too."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    outputs = []
+    for bulk in (False, True):
+        folder = os.path.join(TMP_FOLDER, "bulk" if bulk else "single")
+        os.makedirs(folder, exist_ok=True)
+        c = Corpus("my test corpus", fts="deferred")
+        d = c.Document(name="doc")
+        s = d.Segment()
+        if bulk:
+            s.Token.bulk(form=["a\nb", "c"], lemma=["x\r\ny", "z"])
+        else:
+            s.Token("a\nb", lemma="x\r\ny")
+            s.Token("c", lemma="z")
+        s.make()
+        d.make()
+        c.make(folder)
+        outputs.append(
+            {
+                fn: UUID.sub("", open(os.path.join(folder, fn)).read())
+                for fn in ("token_form.csv", "token_lemma.csv", "fts_vector.csv")
+            }
+        )
+    assert outputs[0] == outputs[1]
+    assert "ab" in outputs[1]["token_form.csv"]
+    assert "'1ab'" in outputs[1]["fts_vector.csv"]
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
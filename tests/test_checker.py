@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import time
+import pytest
+
+from lcpcli.builder import *
+from lcpcli.check_files import Checker
+
+TMP_FOLDER = os.path.join(os.path.dirname(__file__), "tmp_data")
+
+
+def test_checker_multiline_values():
+    """Test checking quoted values that span several lines, with exact line numbers."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    c = Corpus("my test corpus")
+    for nd in range(2):
+        d = c.Document(title=f"first line {nd}\nsecond line")
+        d.Segment(c.Token("hello"), c.Token("world")).make()
+        d.make()
+    c.make(TMP_FOLDER)
+
+    conf = json.loads(open(os.path.join(TMP_FOLDER, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(TMP_FOLDER, full=True, add_zero=False)
+
+    # the row of the second document starts on line 4
+    with open(os.path.join(TMP_FOLDER, "document.csv"), "r", newline="") as f:
+        content = f.read()
+    with open(os.path.join(TMP_FOLDER, "document.csv"), "w", newline="") as f:
+        f.write(content.replace("\n2,", "\nx,"))
+    with pytest.raises(ValueError, match="on line 4 in document.csv"):
+        checker.check_existing_file("document.csv", TMP_FOLDER)
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_checker_invalid_values():
+    """Test that the compiled column checks report invalid values as before."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    c = Corpus("my test corpus")
+    d = c.Document(name="doc")
+    d.Segment(c.Token("hello", upos="NOUN"), c.Token("world", upos="VERB")).make()
+    d.make()
+    c.make(TMP_FOLDER)
+
+    conf = json.loads(open(os.path.join(TMP_FOLDER, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(TMP_FOLDER, full=True, add_zero=False)
+
+    token_csv = os.path.join(TMP_FOLDER, "token.csv")
+    with open(token_csv, "r", newline="") as f:
+        content = f.read()
+    for old, new, error in [
+        ("VERB", "ADJ", "Categorical value 'ADJ' is not in the listed values"),
+        ("[0,", "[x,", "Range 'char_range' not in the right format"),
+        (",1,", ",,", "Found an empty value for column"),
+    ]:
+        assert old in content
+        with open(token_csv, "w", newline="") as f:
+            f.write(content.replace(old, new, 1))
+        with pytest.raises((AssertionError, ValueError), match=error):
+            checker.check_existing_file("token.csv", TMP_FOLDER)
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+class RowCounter:
+    """Picklable row callback, merged from the processes checking the files"""
+
+    def __init__(self):
+        self.rows: dict[str, int] = {}
+
+    def __call__(self, cols, headers, filename, *_):
+        self.rows[filename] = self.rows.get(filename, 0) + 1
+
+    def merge(self, other):
+        for filename, n in other.rows.items():
+            self.rows[filename] = self.rows.get(filename, 0) + n
+
+
+def test_checker_workers():
+    """Test checking the files in parallel processes."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    c = Corpus("my test corpus")
+    for nd in range(3):
+        d = c.Document(name=f"doc {nd}")
+        for _ in range(4):
+            d.Segment(c.Token("hello", upos="NOUN"), c.Token("world")).make()
+        d.make()
+    c.make(TMP_FOLDER)
+
+    conf = json.loads(open(os.path.join(TMP_FOLDER, "config.json"), "r").read())
+    checker = Checker(conf)
+    counters = [RowCounter(), RowCounter()]
+    checker.run_checks(TMP_FOLDER, callback=counters[0])
+    checker.run_checks(TMP_FOLDER, callback=counters[1], workers=2)
+    assert counters[0].rows == counters[1].rows
+    assert counters[1].rows["token.csv"] == 24
+
+    with pytest.raises(AssertionError, match="requires a callback with a merge"):
+        checker.run_checks(TMP_FOLDER, callback=lambda *_: None, workers=2)
+
+    token_csv = os.path.join(TMP_FOLDER, "token.csv")
+    with open(token_csv, "r", newline="") as f:
+        content = f.read()
+    with open(token_csv, "w", newline="") as f:
+        f.write(content.replace("NOUN", "X" * 100, 1))
+    with pytest.raises(ValueError, match="exceeds the database's limit"):
+        checker.run_checks(TMP_FOLDER, workers=2)
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_checker_chunks():
+    """Test checking large files in chunks, with quoted newlines and exact lines."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    c = Corpus("my test corpus")
+    for nd in range(40):
+        d = c.Document(name=f"doc {nd}", title=f'a "title"\rover\r\n{nd} lines')
+        d.Segment(c.Token("hello", upos="NOUN"), c.Token("world")).make()
+        d.make()
+    c.make(TMP_FOLDER)
+
+    conf = json.loads(open(os.path.join(TMP_FOLDER, "config.json"), "r").read())
+    checker = Checker(conf)
+    chunks = checker.file_chunks("document.csv", TMP_FOLDER, chunk_size=100)
+    assert len(chunks) > 5
+    size = os.path.getsize(os.path.join(TMP_FOLDER, "document.csv"))
+    with open(os.path.join(TMP_FOLDER, "document.csv"), "rb") as f:
+        header_size = len(f.readline())
+    assert sum(chunk_size for chunk_size, _ in chunks) == size - header_size
+    counters = [RowCounter(), RowCounter()]
+    checker.run_checks(TMP_FOLDER, callback=counters[0])
+    checker.run_checks(TMP_FOLDER, callback=counters[1], workers=2, chunk_size=100)
+    assert counters[0].rows == counters[1].rows
+    assert counters[1].rows["document.csv"] == 40
+
+    # the rows of the documents span 3 lines (\r, \r\n and \n): document 31
+    # starts on line 92
+    with open(os.path.join(TMP_FOLDER, "document.csv"), "r", newline="") as f:
+        content = f.read()
+    with open(os.path.join(TMP_FOLDER, "document.csv"), "w", newline="") as f:
+        f.write(content.replace("\n31,", "\nx,"))
+    with pytest.raises(ValueError, match="on line 92 in document.csv"):
+        checker.run_checks(TMP_FOLDER, workers=2, chunk_size=100)
+
+    # a quote character that does not enclose a value breaks the parity of quotes
+    with open(os.path.join(TMP_FOLDER, "document.csv"), "w", newline="") as f:
+        f.write(content.replace(",doc 3,", ',doc 3",'))
+    chunks = checker.file_chunks("document.csv", TMP_FOLDER, chunk_size=100)
+    assert chunks == [(size + 1, None)]
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_checker_ftsvector():
+    """Test checking tsvectors, with the offset of the invalid units."""
+    checker = Checker({})
+    for vector in ("'1a':1", "'1it''s':1,3 '2b':2 ", "'1a b':1\t'2''':2"):
+        checker.check_ftsvector(vector)
+    checker.check_ftsvector("'1" + "\\" * 100000 + "':1 '2a':2")
+    for vector, offset in [
+        ("'1a':1 'b':2", 7),
+        ("'1a':1 '2b'':2", 7),
+        ("'1a':1 '2b':", 11),
+        ("'1a':1  '2b':2", 7),
+        ("'1a':1,'2b':2", 6),
+        # a value that does not end is found in linear time
+        ("'" + "1" * 100000, 0),
+        ("'1" + "''" * 100000 + "x", 0),
+        ("'1a':1 '2" + "\\" * 100000, 7),
+        ("'1a':1 '2" + "\\''" * 100000, 7),
+        ("'1a':1 '2b':" + "1," * 100000, 200011),
+    ]:
+        start = time.perf_counter()
+        with pytest.raises((AssertionError, SyntaxError), match=f"offset {offset} "):
+            checker.check_ftsvector(vector)
+        assert time.perf_counter() - start < 1
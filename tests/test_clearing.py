@@ -2,7 +2,7 @@ import json
 import os
 import shutil
 import pytest
-import resource
+import tracemalloc
 from lcpcli.builder import *
 from lcpcli.check_files import Checker
 
@@ -17,11 +17,15 @@ def test_clearing():
         "my test corpus", description="This is just a test corpus", authors="Jeremy"
     )
     globs = [c.Speaker({"name": "Jane Doe"}), c.Speaker({"name": "John Doe"})]
-    for nd in range(10):
+    first_doc_memory = 0
+    memory = 0
+    # the memory currently allocated, not the peak of the process
+    tracemalloc.start()
+    for nd in range(5):
         d = c.Document(name=f"Document {nd}")
-        for np in range(20):
+        for np in range(5):
             p = d.Paragraph(name=f"Paragraph {np}", speaker=globs[np % 2])
-            for ns in range(30):
+            for ns in range(10):
                 tokens = []
                 for nt in range(40):
                     tokens.append(c.Token(f"Form {nt}", pos="NN"))
@@ -30,14 +34,15 @@ def test_clearing():
                 del s
             p.make(clear=True)
             del p
-            print(
-                f"[PAR] Current memory usage: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}"
-            )
         d.make(clear=True)
         del d
-        print(
-            f"[DOC] Current memory usage: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}"
-        )
+        memory = tracemalloc.get_traced_memory()[0]
+        first_doc_memory = first_doc_memory or memory
+        print(f"[DOC] Current memory usage: {memory / 1024:.0f}kB")
+    tracemalloc.stop()
+    # Cleared layers should be freed: the memory should stay flat across documents
+    # (without clearing, each document adds about as much as the first one)
+    assert memory - first_doc_memory < 0.1 * first_doc_memory
     c.make(TMP_FOLDER)
     # Validate the generated files
     conf = json.loads(open(os.path.join(TMP_FOLDER, "config.json"), "r").read())
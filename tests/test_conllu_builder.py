@@ -1,21 +1,21 @@
+import bz2
+import csv
+import gzip
 import json
+import lzma
 import os
 import re
 import shutil
 import pytest
 
-from lcpcli.corpert import Corpert
+from lcpcli.builder import CACHE_MANIFEST, SHARD_STATE
+from lcpcli.corpert import CACHE_FOLDER, Corpert
 from lcpcli.check_files import Checker
 
 TMP_FOLDER = os.path.join(os.path.dirname(__file__), "tmp_data")
+UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
 
-
-def test_conllu_builder():
-    """Test creating a corpus from CONLLU data."""
-    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
-    os.makedirs(TMP_FOLDER, exist_ok=True)
-
-    conllu_str = """# newdoc id = unine15a01m
+CONLLU_STR = """# newdoc id = unine15a01m
 # newdoc audio = unine15a01m.mp3
 # newdoc end = 715.19
 # newdoc filename = unine15a01m.xml
@@ -141,6 +141,14 @@ def test_conllu_builder():
 23	un	un	_	DET	_	_	_	_	agreement=ms|start=15.92|end=16.03
 24	belge	belge	_	ADJ	_	_	_	_	agreement=ms:fs|start=16.03|end=16.28"""
 
+
+def test_conllu_builder():
+    """Test creating a corpus from CONLLU data."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+
+    conllu_str = CONLLU_STR
+
     input_dir = os.path.join(TMP_FOLDER, "input")
     output_dir = os.path.join(TMP_FOLDER, "output")
     os.makedirs(input_dir, exist_ok=True)
@@ -159,3 +167,146 @@ def test_conllu_builder():
 
     # Clean up
     shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def convert(input_dir: str, output_dir: str, **kwargs) -> dict[str, str]:
+    """Convert and check input_dir, and read the output files with ranked UUIDs."""
+    os.makedirs(output_dir, exist_ok=True)
+    cor = Corpert(input_dir, output_dir, **kwargs)
+    cor.run(conll_only=True, overwite_output=True)
+    conf = json.loads(open(os.path.join(output_dir, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(output_dir, full=True, add_zero=False)
+    uuids: dict[str, str] = {}
+    output = {}
+    for fn in ["segment.csv", *sorted(os.listdir(output_dir))]:
+        if not os.path.isfile(os.path.join(output_dir, fn)):
+            continue
+        with open(os.path.join(output_dir, fn), "r") as f:
+            output[fn] = UUID.sub(
+                lambda m: uuids.setdefault(m[0], f"UUID{len(uuids)}"), f.read()
+            )
+    return output
+
+
+def test_conllu_builder_jobs():
+    """Test that converting CONLLU files in parallel gives the same files."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    input_dir = os.path.join(TMP_FOLDER, "input")
+    os.makedirs(input_dir, exist_ok=True)
+    sentences = CONLLU_STR.split("\n\n")
+    for n_file, n_sentence in enumerate((0, 4, 7)):
+        with open(os.path.join(input_dir, f"input{n_file}.conllu"), "w") as f:
+            f.write("\n\n".join(sentences[n_sentence : n_sentence + 4]))
+
+    outputs = [
+        convert(input_dir, os.path.join(TMP_FOLDER, f"output{jobs}"), jobs=jobs)
+        for jobs in (1, 3)
+    ]
+
+    assert len(outputs[0]["document.csv"].splitlines()) == 4
+    assert outputs[0] == outputs[1]
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_conllu_builder_incremental():
+    """Test that an incremental run only converts the files that changed."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    input_dir = os.path.join(TMP_FOLDER, "input")
+    output_dir = os.path.join(TMP_FOLDER, "output")
+    cache_dir = os.path.join(output_dir, CACHE_FOLDER)
+    os.makedirs(input_dir, exist_ok=True)
+    sentences = CONLLU_STR.split("\n\n")
+    for n_file, n_sentence in enumerate((0, 4, 7)):
+        with open(os.path.join(input_dir, f"input{n_file}.conllu"), "w") as f:
+            f.write("\n\n".join(sentences[n_sentence : n_sentence + 4]))
+
+    def cached_shards() -> dict[str, int]:
+        with open(os.path.join(cache_dir, CACHE_MANIFEST), "r") as f:
+            shards = json.load(f)["shards"]
+        return {
+            shard["shard"]: os.stat(
+                os.path.join(cache_dir, key, SHARD_STATE)
+            ).st_mtime_ns
+            for key, shard in shards.items()
+        }
+
+    convert(input_dir, output_dir, incremental=True)
+    first = cached_shards()
+    assert len(first) == 3
+
+    with open(os.path.join(input_dir, "input1.conllu"), "a") as f:
+        f.write("\n\n# sent_id = new\n1\tnouveau\tnouveau\t_\tADJ\t_\t_\t_\t_\t_")
+    incremental = convert(input_dir, output_dir, incremental=True)
+    second = cached_shards()
+    # the shard of the previous version of input1 was removed
+    assert len(os.listdir(cache_dir)) == len(second) + 1
+    changed = os.path.join(input_dir, "input1.conllu")
+    assert {fn for fn in first if first[fn] == second.get(fn)} == set(first) - {changed}
+    assert incremental == convert(input_dir, os.path.join(TMP_FOLDER, "fresh"))
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_conllu_builder_root_heads():
+    """Test that tokens with a HEAD of 0 make root dependencies."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    input_dir = os.path.join(TMP_FOLDER, "input")
+    output_dir = os.path.join(TMP_FOLDER, "output")
+    os.makedirs(input_dir, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+    in_conllu = os.path.join(
+        os.path.dirname(__file__), "..", "lcpcli", "data", "input", "in.conllu"
+    )
+    shutil.copy(in_conllu, input_dir)
+
+    cor = Corpert(input_dir, output_dir)
+    cor.run(conll_only=True, overwite_output=True)
+
+    conf = json.loads(open(os.path.join(output_dir, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(output_dir, full=True, add_zero=False)
+    with open(os.path.join(output_dir, "deprel.csv"), "r") as deprel_file:
+        rows = list(csv.DictReader(deprel_file))
+    n_sentences = open(in_conllu, "r").read().count("# sent_id")
+    assert len([r for r in rows if not r["head"]]) == n_sentences
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_conllu_builder_compressed():
+    """Test that compressed CONLLU files give the same files as plain ones."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    sentences = CONLLU_STR.split("\n\n")
+    # the last file is gzipped but only recognized from its first bytes
+    compressions = [
+        (".gz", gzip.compress),
+        (".xz", lzma.compress),
+        (".bz2", bz2.compress),
+        ("", gzip.compress),
+    ]
+    for n_file, (ext, compress) in enumerate(compressions):
+        plain_dir = os.path.join(TMP_FOLDER, f"plain{n_file}")
+        compressed_dir = os.path.join(TMP_FOLDER, f"compressed{n_file}")
+        os.makedirs(plain_dir, exist_ok=True)
+        os.makedirs(compressed_dir, exist_ok=True)
+        content = "\n\n".join(sentences[n_file * 2 : n_file * 2 + 3]).encode()
+        with open(os.path.join(plain_dir, "input.conllu"), "wb") as f:
+            f.write(content)
+        with open(os.path.join(compressed_dir, "input.conllu" + ext), "wb") as f:
+            f.write(compress(content))
+        # not a CoNLL-U file: ignored with conll_only
+        with open(os.path.join(compressed_dir, "notes.txt.gz"), "wb") as f:
+            f.write(gzip.compress(b"not a CoNLL-U file"))
+
+        plain = convert(plain_dir, os.path.join(plain_dir, "output"))
+        compressed = convert(compressed_dir, os.path.join(compressed_dir, "output"))
+        assert len(plain["token.csv"].splitlines()) > 1
+        assert plain == compressed
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
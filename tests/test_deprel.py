@@ -96,11 +96,41 @@ def test_deprel_corpus_creation():
     d = c.Document(s1, s2, title="only document")
     d.make()
     c.make(TMP_FOLDER)
-    
+
     # Validate the generated files
     conf = json.loads(open(os.path.join(TMP_FOLDER, "config.json"), "r").read())
     checker = Checker(conf)
     checker.run_checks(TMP_FOLDER, full=True, add_zero=False)
-    
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_deprel_make_from_layer():
+    """Test making relations with the layer method of a parent layer."""
+    outputs = []
+    for from_layer in (False, True):
+        shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+        os.makedirs(TMP_FOLDER, exist_ok=True)
+        c = Corpus("my test corpus")
+        tokens = [c.Token(form) for form in ("I", "just", "shot")]
+        d = c.Document(name="doc")
+        s = d.Segment(*tokens)
+        s.make()
+        rels = [
+            c.DepRel(dependent=tokens[2], udep="root"),
+            c.DepRel(head=tokens[2], dependent=tokens[0], udep="nsubj"),
+            c.DepRel(head=tokens[2], dependent=tokens[1], udep="advmod"),
+        ]
+        if from_layer:
+            assert hasattr(s.DepRel, "make")
+            s.DepRel.make(*rels)
+        else:
+            c.DepRel.make(*rels)
+        d.make()
+        c.make(TMP_FOLDER)
+        with open(os.path.join(TMP_FOLDER, "deprel.csv")) as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1]
     # Clean up
     shutil.rmtree(TMP_FOLDER, ignore_errors=True)
@@ -0,0 +1,148 @@
+import csv
+import json
+import os
+import shutil
+import pytest
+
+from lcpcli.builder import *
+from lcpcli.check_files import Checker
+
+TMP_FOLDER = os.path.join(os.path.dirname(__file__), "tmp_data")
+
+WORDS = ["hello", "l'amour", 'say "hi"', "back\\slash", "new\\nline", "bye"]
+
+
+def build_corpus(folder: str, **kwargs) -> tuple[list[str], list[list[str]]]:
+    c = Corpus("my test corpus", fts=kwargs.pop("fts"))
+    for nd in range(3):
+        segments = []
+        for ns in range(40):
+            tokens = [
+                c.Token(WORDS[(nd + ns + nt) % len(WORDS)], lemma=f"lemma{nt}")
+                for nt in range(1 + ns % 5)
+            ]
+            segments.append(c.Segment(*tokens))
+        c.Document(*segments, title=f"document {nd}").make()
+    c.make(folder, **kwargs)
+
+    conf = json.loads(open(os.path.join(folder, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(folder, full=True, add_zero=False)
+
+    with open(os.path.join(folder, "segment.csv"), "r") as segment_file:
+        segment_ids = [r["segment_id"] for r in csv.DictReader(segment_file)]
+    fts_path = os.path.join(folder, "fts_vector.csv")
+    if not os.path.exists(fts_path):
+        return (segment_ids, [])
+    with open(fts_path, "r") as fts_file:
+        rows = list(csv.reader(fts_file))
+    return (segment_ids, rows)
+
+
+def test_fts_modes():
+    """Test that deferred FTS vectors are the same as the inline ones."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    results = {}
+    for fts, workers in (("inline", 1), ("deferred", 1), ("deferred", 3)):
+        folder = os.path.join(TMP_FOLDER, f"{fts}{workers}")
+        os.makedirs(folder, exist_ok=True)
+        results[(fts, workers)] = build_corpus(folder, fts=fts, workers=workers)
+
+    segment_ids, inline_rows = results[("inline", 1)]
+    assert inline_rows[0] == ["segment_id", "vector"]
+    assert [r[0] for r in inline_rows[1:]] == segment_ids
+    for fts, workers in (("deferred", 1), ("deferred", 3)):
+        segment_ids, rows = results[(fts, workers)]
+        assert [r[0] for r in rows[1:]] == segment_ids
+        assert [r[1] for r in rows] == [r[1] for r in inline_rows]
+
+    folder = os.path.join(TMP_FOLDER, "none")
+    os.makedirs(folder, exist_ok=True)
+    assert build_corpus(folder, fts="none")[1] == []
+
+    with pytest.raises(AssertionError):
+        Corpus("my test corpus", fts="sometimes")
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_fts_deferred_missing_and_chunks(monkeypatch):
+    """Test deferred FTS vectors with missing attributes, in several chunks."""
+    import lcpcli.builder
+
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    vectors = []
+    for chunk_size in (lcpcli.builder.FTS_CHUNK_SIZE, 200):
+        monkeypatch.setattr(lcpcli.builder, "FTS_CHUNK_SIZE", chunk_size)
+        folder = os.path.join(TMP_FOLDER, str(chunk_size))
+        os.makedirs(folder, exist_ok=True)
+        c = Corpus("my test corpus", fts="deferred")
+        d = c.Document(title="document")
+        for ns in range(20):
+            s = d.Segment()
+            s.Token("hello", lemma="hi", xpos="X")
+            # no lemma: no lexeme rather than an empty one
+            s.Token(f"world{ns}", xpos="Y")
+            s.make()
+        d.make()
+        c.make(folder)
+        with open(os.path.join(folder, "fts_vector.csv"), "r") as fts_file:
+            vectors.append([r["vector"] for r in csv.DictReader(fts_file)])
+    assert vectors[0] == vectors[1]
+    assert vectors[0][0] == "'1hello':1 '2hi':1 '3X':1 '1world0':2 '3Y':2"
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def build_mixed_corpus(folder: str, fts: str) -> str:
+    """Build a corpus whose tokens set their attributes in different orders."""
+    c = Corpus("my test corpus", fts=fts)
+    for nd in range(2):
+        d = c.Document(title=f"document {nd}")
+        for ns in range(10):
+            s = d.Segment()
+            for nt in range(1 + ns % 4):
+                word = WORDS[(nd + ns + nt) % len(WORDS)]
+                if nt % 3 == 0:
+                    s.Token(word, lemma=f"lemma{nt}", xpos=f"X{ns % 2}")
+                elif nt % 3 == 1:
+                    s.Token(word, xpos=f"X{ns % 2}", lemma="")
+                else:
+                    s.Token(word, note=f"note{nd}", lemma=f"lemma{nt}")
+            s.make()
+        d.make()
+    c.make(folder)
+    with open(os.path.join(folder, "segment.csv"), "r") as segment_file:
+        segment_ids = [r["segment_id"] for r in csv.DictReader(segment_file)]
+    with open(os.path.join(folder, "fts_vector.csv"), "r") as fts_file:
+        vectors = fts_file.read()
+    for n, segment_id in enumerate(segment_ids):
+        vectors = vectors.replace(segment_id, f"segment{n}")
+    return vectors
+
+
+def test_fts_modes_attribute_order():
+    """Test that the lexemes are numbered the same way inline and deferred."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    vectors = {}
+    for fts in ("inline", "deferred"):
+        folder = os.path.join(TMP_FOLDER, fts)
+        os.makedirs(folder, exist_ok=True)
+        vectors[fts] = build_mixed_corpus(folder, fts)
+    assert vectors["inline"] == vectors["deferred"]
+    assert "'2lemma0':1 '3X0':1 '1l''amour':2 '3X0':2" in vectors["inline"]
+
+    # the tokens of a segment must be made together
+    c = Corpus("my test corpus", fts="deferred")
+    t1, t2, t3 = c.Token("a"), c.Token("b"), c.Token("c")
+    c.Segment(t1, t3)
+    c.Segment(t2)
+    t1.make()
+    t2.make()
+    with pytest.raises(AssertionError, match="were made after the tokens"):
+        t3.make()
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
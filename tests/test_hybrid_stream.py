@@ -33,11 +33,61 @@ def test_hybrid_stream_corpus_creation():
     d2 = c.Book(c.Sentence(original=""))
     d2.make()
     c.make(TMP_FOLDER)
-    
+
     # Validate the generated files
     conf = json.loads(open(os.path.join(TMP_FOLDER, "config.json"), "r").read())
     checker = Checker(conf)
     checker.run_checks(TMP_FOLDER, full=True, add_zero=False)
-    
+
+    # The comment occupies one character of the stream between the words
+    assert conf["layer"]["Comment"]["anchoring"]["stream"]
+    with open(os.path.join(TMP_FOLDER, "comment.csv"), "r") as comment_file:
+        assert comment_file.read().splitlines() == [
+            "comment_id,char_range,value",
+            '1,"[16,17)",pause',
+        ]
+    with open(os.path.join(TMP_FOLDER, "word.csv"), "r") as word_file:
+        char_ranges = [line.split('"')[1] for line in word_file.readlines()[1:]]
+    assert char_ranges == ["[0,6)", "[6,12)", "[12,16)", "[17,23)"]
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_in_stream_decision_per_layer_type(monkeypatch):
+    """Test that the stream anchoring of a layer type is only decided once."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    c = Corpus("my test corpus")
+    n_checks = {"n": 0}
+    type_in_stream = Corpus._type_in_stream
+
+    def counting_type_in_stream(self, *args, **kwargs):
+        n_checks["n"] += 1
+        return type_in_stream(self, *args, **kwargs)
+
+    monkeypatch.setattr(Corpus, "_type_in_stream", counting_type_in_stream)
+    for nd in range(5):
+        shots = [c.Shot(n_shot=ns).set_time(ns * 10, ns * 10 + 10) for ns in range(20)]
+        d = c.Document(c.Segment(c.Token("hello")), *shots)
+        d.make()
+    checks_after_5_documents = n_checks["n"]
+    for nd in range(50):
+        shots = [c.Shot(n_shot=ns).set_time(ns * 10, ns * 10 + 10) for ns in range(20)]
+        d = c.Document(c.Segment(c.Token("hello")), *shots)
+        d.make()
+    # Shots sit next to stream-anchored segments: decided once for the type
+    assert n_checks["n"] == checks_after_5_documents
+    for nd in range(5):
+        c.Chapter(*[c.Note(text="note") for _ in range(20)]).make()
+    checks_after_5_chapters = n_checks["n"]
+    for nd in range(50):
+        c.Chapter(*[c.Note(text="note") for _ in range(20)]).make()
+    # Notes are not next to any stream-anchored layer: the negative decision is cached
+    assert n_checks["n"] == checks_after_5_chapters
+    c.make(TMP_FOLDER)
+    conf = json.loads(open(os.path.join(TMP_FOLDER, "config.json"), "r").read())
+    assert conf["layer"]["Shot"]["anchoring"]["stream"]
+    assert not conf["layer"]["Note"]["anchoring"]["stream"]
     # Clean up
     shutil.rmtree(TMP_FOLDER, ignore_errors=True)
@@ -1,3 +1,4 @@
+import csv
 import json
 import os
 import shutil
@@ -32,6 +33,41 @@ def test_labels_custom_firstclass_corpus_creation():
     conf = json.loads(open(os.path.join(TMP_FOLDER, "config.json"), "r").read())
     checker = Checker(conf)
     checker.run_checks(TMP_FOLDER, full=True, add_zero=False)
-    
+
+    # Bits are read right to left: positive=0, greetings=1, negative=2
+    assert conf["layer"]["Sentence"]["attributes"]["keywords"]["nlabels"] == 3
+    with open(os.path.join(TMP_FOLDER, "sentence.csv"), "r") as sentence_file:
+        rows = list(csv.DictReader(sentence_file))
+    assert [r["keywords"] for r in rows] == ["011", "110"]
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_many_labels():
+    """Test that label sets with hundreds of labels have fixed-width bits."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    c = Corpus("my test corpus", document="Book", segment="Sentence", token="Word")
+    sentences = []
+    for ns in range(300):
+        s = c.Sentence(c.Word("hello"), tags=[f"tag{ns}", "common"])
+        s.make()
+        sentences.append(s)
+    c.Book(*sentences).make()
+    c.make(TMP_FOLDER)
+
+    conf = json.loads(open(os.path.join(TMP_FOLDER, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(TMP_FOLDER, full=True, add_zero=False)
+
+    assert conf["layer"]["Sentence"]["attributes"]["tags"]["nlabels"] == 301
+    with open(os.path.join(TMP_FOLDER, "sentence.csv"), "r") as sentence_file:
+        rows = list(csv.DictReader(sentence_file))
+    assert all(len(r["tags"]) == 301 for r in rows)
+    # tag0 and common were the first two labels
+    assert rows[0]["tags"] == "0" * 299 + "11"
+    assert rows[-1]["tags"] == "1" + "0" * 298 + "10"
+
     # Clean up
     shutil.rmtree(TMP_FOLDER, ignore_errors=True)
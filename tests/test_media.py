@@ -41,3 +41,68 @@ def test_media_corpus_creation():
     
     # Clean up
     shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_media_document_times():
+    """Test that documents cover the time of their children, without gaps or overlaps."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    c = Corpus("my test corpus")
+    frame = 0
+    # timed tokens, made through their segments
+    for nd in range(3):
+        d = c.Document(name=f"doc {nd}")
+        for ns in range(3):
+            s = d.Segment()
+            for nt in range(2 + ns):
+                s.Token(f"w{nt}").set_time(frame, frame + 5)
+                frame += 5
+            s.make()
+        frame += 7  # a gap between the documents
+        d.make()
+    # timed segments, made before their document
+    segments = []
+    for ns in range(3):
+        s = c.Segment(c.Token("x"), c.Token("y")).set_time(frame, frame + 10)
+        frame += 10
+        segments.append(s.make())
+    c.Document(*segments, name="doc 3").make()
+    frame += 4
+    # timed segments, made by their document
+    d = c.Document(name="doc 4")
+    for ns in range(2):
+        d.Segment(c.Token("z")).set_time(frame, frame + 3)
+        frame += 3
+    d.make()
+    c.make(TMP_FOLDER)
+
+    def frame_ranges(fn: str) -> list[str]:
+        with open(os.path.join(TMP_FOLDER, fn), "r") as f:
+            return [row["frame_range"] for row in csv.DictReader(f)]
+
+    # the documents start where the previous one ends
+    assert frame_ranges("document.csv") == [
+        "[0,45)",
+        "[45,97)",
+        "[97,149)",
+        "[149,186)",
+        "[186,196)",
+    ]
+    assert frame_ranges("segment.csv") == [
+        "[0,10)",
+        "[10,25)",
+        "[25,45)",
+        "[52,62)",
+        "[62,77)",
+        "[77,97)",
+        "[104,114)",
+        "[114,129)",
+        "[129,149)",
+        "[156,166)",
+        "[166,176)",
+        "[176,186)",
+        "[190,193)",
+        "[193,196)",
+    ]
+
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
@@ -0,0 +1,48 @@
+import json
+import os
+import shutil
+import pytest
+
+from lcpcli.builder import *
+from lcpcli.check_files import Checker
+
+TMP_FOLDER = os.path.join(os.path.dirname(__file__), "tmp_data")
+
+
+def build_corpus(folder: str, workers: int) -> None:
+    c = Corpus("my test corpus")
+    for nd in range(3):
+        d = c.Document(name=f"Document {nd}")
+        for ns in range(10):
+            tokens = [
+                c.Token(f"form {nt}", pos=f"P{nt % 5}", tags=[f"T{nt % 3}"])
+                for nt in range(10)
+            ]
+            if ns == 5:
+                tokens[0].late = "late attribute"
+            s = d.Segment(*tokens)
+            s.NamedEntity(*tokens[2:4], kind="PER")
+            s.make()
+        d.make()
+    c.make(folder, workers=workers)
+
+
+def test_parallel_make():
+    """Test writing the layer files in parallel processes."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    sequential_folder = os.path.join(TMP_FOLDER, "sequential")
+    parallel_folder = os.path.join(TMP_FOLDER, "parallel")
+    os.makedirs(sequential_folder, exist_ok=True)
+    os.makedirs(parallel_folder, exist_ok=True)
+    build_corpus(sequential_folder, workers=1)
+    build_corpus(parallel_folder, workers=3)
+    for fn in ("config.json", "document.csv", "token_form.csv", "namedentity.csv"):
+        with open(os.path.join(sequential_folder, fn)) as sequential:
+            with open(os.path.join(parallel_folder, fn)) as parallel:
+                assert sequential.read() == parallel.read()
+    # Validate the generated files
+    conf = json.loads(open(os.path.join(parallel_folder, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(parallel_folder, full=True, add_zero=False)
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
@@ -31,3 +31,32 @@ def test_pos_corpus_creation():
     
     # Clean up
     shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_pos_text_to_categorical():
+    """Test that texts turned categorical are written as values, including the padding."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    os.makedirs(TMP_FOLDER, exist_ok=True)
+    c = Corpus("my test corpus")
+    c.Document(
+        c.Segment(
+            c.Token("Foxes", lemma="fox"),
+            c.Token("red", lemma="red", xpos="JJ"),
+            c.Token("fox", lemma="fox", xpos="NN"),
+            c.Token("jumps", lemma="jump", xpos="VBZ"),
+            c.Token("far", lemma="far", xpos="RB"),
+            c.Token("fox", lemma="fox", xpos="NN"),
+        )
+    ).make()
+    c.make(TMP_FOLDER)
+
+    conf = json.loads(open(os.path.join(TMP_FOLDER, "config.json"), "r").read())
+    assert conf["layer"]["Token"]["attributes"]["xpos"]["type"] == "categorical"
+    assert not os.path.exists(os.path.join(TMP_FOLDER, "token_xpos.csv"))
+    with open(os.path.join(TMP_FOLDER, "token.csv"), "r") as token_file:
+        rows = list(csv.DictReader(token_file))
+    assert [row["xpos"] for row in rows] == ["", "JJ", "NN", "VBZ", "RB", "NN"]
+    checker = Checker(conf)
+    checker.run_checks(TMP_FOLDER, full=True, add_zero=False)
+
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
@@ -0,0 +1,41 @@
+import sys
+
+from lcpcli.progress import Progress
+
+
+def test_progress_not_a_tty(monkeypatch, capsys):
+    """Test that no bar is drawn when stderr is not a terminal."""
+    monkeypatch.setattr(sys.stderr, "isatty", lambda: False)
+    progress = Progress(1000, desc="Testing")
+    assert progress.bar is None
+    assert not progress.due()
+    progress.update(10, "Still testing")
+    progress.write("a message")
+    progress.close(1000, "Done")
+    assert capsys.readouterr().out == "a message\n"
+
+
+def test_progress_quiet(monkeypatch):
+    """Test that Progress.quiet disables the bar even in a terminal."""
+    monkeypatch.setattr(sys.stderr, "isatty", lambda: True)
+    monkeypatch.setattr(Progress, "quiet", True)
+    assert Progress(1000).bar is None
+
+
+def test_progress_throttled(monkeypatch):
+    """Test that many updates in a short time only redraw the bar a few times."""
+    monkeypatch.setattr(sys.stderr, "isatty", lambda: True)
+    progress = Progress(100000, desc="Testing", updates_per_second=1)
+    assert progress.bar is not None
+    refreshes = []
+    refresh = progress.bar.refresh
+    monkeypatch.setattr(
+        progress.bar, "refresh", lambda *a, **kw: refreshes.append(refresh(*a, **kw))
+    )
+    for n in range(100000):
+        if progress.due():
+            progress.update(n, f"Testing {n}")
+    assert 1 <= len(refreshes) < 10
+    progress.close(100000, "Done")
+    assert progress.bar is None
+    assert len(refreshes) >= 2
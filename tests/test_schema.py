@@ -0,0 +1,75 @@
+import json
+import os
+import re
+import shutil
+import pytest
+
+from lcpcli.builder import *
+from lcpcli.check_files import Checker
+
+TMP_FOLDER = os.path.join(os.path.dirname(__file__), "tmp_data")
+UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def build_corpus(folder: str, **kwargs) -> None:
+    c = Corpus("my test corpus", **kwargs)
+    for nd in range(2):
+        d = c.Document(name=f"Document {nd}", meta={"year": 2000 + nd})
+        for ns in range(5):
+            tokens = [
+                c.Token(
+                    f"form {nt}",
+                    lemma=str(nt % 4),
+                    pos=f"P{nt % 5}",
+                    score=nt / 2,
+                    tags=[f"T{nt % 3}"],
+                    misc={"n": str(nt)},
+                )
+                for nt in range(6)
+            ]
+            s = d.Segment(*tokens, speaker=f"S{ns % 2}")
+            s.NamedEntity(*tokens[2:4], kind="PER")
+            deps = [c.DepRel(dependent=tokens[0])] + [
+                c.DepRel(head=tokens[0], dependent=t, rel="dep") for t in tokens[1:]
+            ]
+            s.make()
+            c.DepRel.make(*deps)
+        d.make()
+    c.make(folder)
+
+
+def test_schema():
+    """Test that declaring the schema of a previous run gives the same files."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    inferred_folder = os.path.join(TMP_FOLDER, "inferred")
+    declared_folder = os.path.join(TMP_FOLDER, "declared")
+    os.makedirs(inferred_folder, exist_ok=True)
+    os.makedirs(declared_folder, exist_ok=True)
+    build_corpus(inferred_folder)
+    with open(os.path.join(inferred_folder, "config.json")) as config_file:
+        config = json.load(config_file)
+    build_corpus(declared_folder, schema=config, debug=True)
+    for fn in sorted(os.listdir(inferred_folder)):
+        with open(os.path.join(inferred_folder, fn)) as inferred:
+            with open(os.path.join(declared_folder, fn)) as declared:
+                # segment ids are random
+                assert UUID.sub("", inferred.read()) == UUID.sub("", declared.read())
+    assert config["layer"]["Token"]["attributes"]["pos"]["type"] == "categorical"
+    # Validate the generated files
+    conf = json.loads(open(os.path.join(declared_folder, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(declared_folder, full=True, add_zero=False)
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_schema_debug():
+    """Test that values are only checked against the schema in debug mode."""
+    schema = {"Token": {"attributes": {"score": {"type": "number"}}}}
+    c = Corpus("my test corpus", schema=schema)
+    c.Token("hello", score="high")
+    c = Corpus("my test corpus", schema=schema, debug=True)
+    with pytest.raises(AssertionError):
+        c.Token("hello", score="high")
+    with pytest.raises(AssertionError):
+        c.Token("hello", score={"value": 1})
@@ -0,0 +1,129 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import pytest
+
+from lcpcli.builder import *
+from lcpcli.check_files import Checker
+
+TMP_FOLDER = os.path.join(os.path.dirname(__file__), "tmp_data")
+
+UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+WORDS = ["hello", "world", "l'amour", "bye", "new", "cinema", "shot"]
+POS = ["NOUN", "VERB", "DET", "ADJ"]
+KEYWORDS = ["greetings", "positive", "negative", "neutral", "question"]
+
+
+def build_documents(c: Corpus, shard: tuple[int, int, int]) -> None:
+    """Make n_docs documents, starting with the document first_doc."""
+    first_doc, n_docs, frame = shard
+    for nd in range(first_doc, first_doc + n_docs):
+        speaker = c.Speaker({"name": f"speaker{nd % 3}"})
+        segments = []
+        for ns in range(4):
+            tokens = []
+            for nt in range(2 + (nd + ns) % 3):
+                word = WORDS[(nd * 7 + ns * 3 + nt) % len(WORDS)]
+                token = c.Token(word, lemma=word.upper(), upos=POS[(nd + nt) % 4])
+                if nd >= 3:
+                    token.xpos = f"x{nt}"
+                tokens.append(token)
+            segment = c.Segment(
+                *tokens,
+                speaker=speaker,
+                keywords=[KEYWORDS[(nd + ns) % 5], KEYWORDS[(nd * ns) % 5]],
+            )
+            segment.set_time(frame, frame + 10)
+            frame += 10
+            segment.make()
+            c.DepRel.make(
+                c.DepRel(dependent=tokens[0], udep="root"),
+                *[
+                    c.DepRel(head=tokens[0], dependent=t, udep="dep")
+                    for t in tokens[1:]
+                ],
+            )
+            segments.append(segment)
+        document = c.Movie(*segments, name=f"movie {nd}", info={"genre": f"g{nd % 2}"})
+        document.set_media("film", f"movie{nd}.mp4")
+        document.make()
+
+
+def read_normalized(folder: str) -> dict[str, str]:
+    """Read all the files in folder, replacing the UUIDs with their rank."""
+    uuids: dict[str, str] = {}
+    contents = {}
+    for fn in ["segment.csv", *sorted(os.listdir(folder))]:
+        with open(os.path.join(folder, fn), "r") as f:
+            contents[fn] = UUID.sub(
+                lambda m: uuids.setdefault(m[0], f"UUID{len(uuids)}"), f.read()
+            )
+    return contents
+
+
+@pytest.mark.parametrize("fts", ["inline", "deferred"])
+def test_sharded_build(fts):
+    """Test that a sharded build gives the same files as a sequential build."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    sequential_folder = os.path.join(TMP_FOLDER, "sequential")
+    sharded_folder = os.path.join(TMP_FOLDER, "sharded")
+    os.makedirs(sequential_folder, exist_ok=True)
+    os.makedirs(sharded_folder, exist_ok=True)
+    shard_sizes = [2, 3, 1, 2]
+    corpus_kwargs = {"name": "my test corpus", "document": "Movie", "fts": fts}
+
+    c = Corpus(**corpus_kwargs)
+    first_doc = 0
+    for n_docs in shard_sizes:
+        build_documents(c, (first_doc, n_docs, first_doc * 40))
+        first_doc += n_docs
+    c.make(sequential_folder)
+
+    shards = []
+    first_doc = 0
+    for n_docs in shard_sizes:
+        # the frames of each shard start at 0, like the char ranges
+        shards.append((first_doc, n_docs, 0))
+        first_doc += n_docs
+    make_sharded(build_documents, shards, sharded_folder, workers=2, **corpus_kwargs)
+
+    conf = json.loads(open(os.path.join(sharded_folder, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(sharded_folder, full=True, add_zero=False)
+    assert conf["layer"]["Token"]["attributes"]["upos"]["type"] == "categorical"
+    assert conf["layer"]["Segment"]["attributes"]["keywords"]["nlabels"] == 5
+
+    sequential = read_normalized(sequential_folder)
+    sharded = read_normalized(sharded_folder)
+    assert sorted(sequential) == sorted(sharded)
+    for fn, content in sequential.items():
+        assert sharded[fn] == content, fn
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def build_odd_shards(c: Corpus, shard: int) -> None:
+    """Make the odd shards, and fail on the even ones once the others are built."""
+    if shard % 2 == 0:
+        time.sleep(0.5)
+        raise ValueError(f"cannot build shard {shard}")
+    build_documents(c, (shard, 1, 0))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sharded_build_error(tmp_path, monkeypatch, workers):
+    """Test that the folders of the shards are removed when a shard fails."""
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    with pytest.raises(ValueError, match="cannot build shard 0"):
+        build_sharded(
+            build_odd_shards,
+            range(4),
+            workers=workers,
+            name="my corpus",
+            document="Movie",
+        )
+    assert not [fn for fn in os.listdir(tmp_path) if fn.startswith("lcpcli_shard_")]
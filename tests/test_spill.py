@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+import pytest
+
+from lcpcli.builder import *
+from lcpcli.check_files import Checker
+
+TMP_FOLDER = os.path.join(os.path.dirname(__file__), "tmp_data")
+
+
+def build_corpus(folder: str, **kwargs) -> Corpus:
+    c = Corpus("my test corpus", **kwargs)
+    for nd in range(3):
+        d = c.Document(name=f"Document {nd}")
+        for ns in range(20):
+            tokens = [
+                c.Token(f"form {nd} {ns} {nt}", lemma=f"lemma {nt}", pos=f"P{nt % 5}")
+                for nt in range(10)
+            ]
+            d.Segment(*tokens, note=f"note {nd} {ns}").make()
+        d.make()
+    c.make(folder)
+    return c
+
+
+def test_spill_corpus_creation():
+    """Test creating a corpus whose lookups exceed the memory budget."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    spilled_folder = os.path.join(TMP_FOLDER, "spilled")
+    memory_folder = os.path.join(TMP_FOLDER, "memory")
+    os.makedirs(spilled_folder, exist_ok=True)
+    os.makedirs(memory_folder, exist_ok=True)
+    c = build_corpus(spilled_folder, max_lookup_bytes=10000)
+    store = c._spill_store
+    assert store.reached
+    assert store._directory is None and not store.lookups
+    build_corpus(memory_folder)
+    # Spilling should not affect the output
+    for fn in ("token_form.csv", "token_lemma.csv", "config.json"):
+        with open(os.path.join(spilled_folder, fn)) as spilled:
+            with open(os.path.join(memory_folder, fn)) as memory:
+                assert spilled.read() == memory.read()
+    # Validate the generated files
+    conf = json.loads(open(os.path.join(spilled_folder, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(spilled_folder, full=True, add_zero=False)
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_spill_store():
+    """Test that spilled entries remain accessible and the cache gets deleted."""
+    store = SpillStore(max_bytes=20000)
+    forms = store.lookup()
+    lemmas = store.lookup()
+    for n in range(1000):
+        forms[f"form {n}"] = n + 1
+        lemmas[f"lemma {n % 500}"] = n % 500 + 1
+    assert store.reached and store.used <= store.max_bytes
+    assert len(forms) == 1000 and len(lemmas) == 500
+    assert forms.on_disk > 0
+    assert forms["form 0"] == 1 and forms.get("form 999") == 1000
+    assert "lemma 10" in lemmas and "form 10" not in lemmas
+    assert sorted(forms.values()) == list(range(1, 1001))
+    assert dict(lemmas.items()) == {f"lemma {n}": n + 1 for n in range(500)}
+    # each lookup only keeps its own entries on disk
+    assert len(forms.cache) == forms.on_disk and len(lemmas.cache) == lemmas.on_disk
+    directory = store.directory
+    assert os.path.isdir(directory)
+    store.close()
+    assert not os.path.exists(directory)
+
+
+def test_spill_store_overwrite():
+    """Test that overwriting an entry in memory replaces its size in the budget."""
+    store = SpillStore(max_bytes=20000)
+    forms = store.lookup()
+    forms["form"] = "x"
+    used = store.used
+    for n in range(1000):
+        forms["form"] = "x" * (n % 10)
+    forms["form"] = "x" * 1000
+    assert store.used == forms.bytes == used + 999
+    forms["form"] = "x"
+    assert store.used == forms.bytes == used
+    assert not store.reached and len(forms) == 1
+    store.close()
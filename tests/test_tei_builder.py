@@ -0,0 +1,120 @@
+import csv
+import gzip
+import json
+import os
+import re
+import shutil
+
+from xml.etree import ElementTree
+
+from lcpcli.corpert import Corpert
+from lcpcli.check_files import Checker
+
+TMP_FOLDER = os.path.join(os.path.dirname(__file__), "tmp_data")
+IN_TEI = os.path.join(
+    os.path.dirname(__file__), "..", "lcpcli", "data", "input", "in_tei_spoken.xml"
+)
+UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+NS = "{http://www.tei-c.org/ns/1.0}"
+
+TEI_STR = """<?xml version="1.0" encoding="UTF-8"?>
+<TEI xmlns="http://www.tei-c.org/ns/1.0" xml:id="written1">
+  <teiHeader><fileDesc><titleStmt><title>A <hi>written</hi> text</title></titleStmt></fileDesc></teiHeader>
+  <text>
+    <body>
+      <p xml:id="p1">
+        <s xml:id="s1">
+          <w lemma="hello">Hello</w>
+          <pc join="left">,</pc>
+          <unclear><w lemma="world" join="right">world</w></unclear>
+          <pc>!</pc>
+        </s>
+        <s xml:id="s2"><w lemma="bye">Bye</w></s>
+      </p>
+      <p xml:id="p2"><s xml:id="s3"><w lemma="again">Again</w></s></p>
+      <p xml:id="empty"><s xml:id="s4"><gap/></s></p>
+    </body>
+  </text>
+</TEI>
+"""
+
+
+def convert(input_dir: str, output_dir: str, **kwargs) -> dict[str, list[dict]]:
+    """Convert and check input_dir, and read the output files with ranked UUIDs."""
+    os.makedirs(output_dir, exist_ok=True)
+    cor = Corpert(input_dir, output_dir, **kwargs)
+    cor.run(overwite_output=True)
+    conf = json.loads(open(os.path.join(output_dir, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(output_dir, full=True, add_zero=False)
+    uuids: dict[str, str] = {}
+    output = {}
+    for fn in ["segment.csv", *sorted(os.listdir(output_dir))]:
+        if not fn.endswith(".csv"):
+            continue
+        with open(os.path.join(output_dir, fn), "r") as f:
+            content = UUID.sub(
+                lambda m: uuids.setdefault(m[0], f"UUID{len(uuids)}"), f.read()
+            )
+        output[fn] = list(csv.DictReader(content.splitlines()))
+    return output
+
+
+def test_tei_builder_spoken():
+    """Test converting the spoken TEI file shipped with lcpcli, in parallel too."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    input_dir = os.path.join(TMP_FOLDER, "input")
+    os.makedirs(input_dir, exist_ok=True)
+    shutil.copy(IN_TEI, input_dir)
+    with open(os.path.join(input_dir, "copy.xml.gz"), "wb") as f:
+        f.write(gzip.compress(open(IN_TEI, "rb").read()))
+
+    outputs = [
+        convert(input_dir, os.path.join(TMP_FOLDER, f"output{jobs}"), jobs=jobs)
+        for jobs in (1, 2)
+    ]
+    assert outputs[0] == outputs[1]
+
+    output = outputs[0]
+    utterances = [
+        u
+        for u in ElementTree.parse(IN_TEI).iter(f"{NS}u")
+        if u.find(f"{NS}w") is not None or u.find(f".//{NS}pc") is not None
+    ]
+    assert len(output["segment.csv"]) == 2 * len(utterances)
+    assert {s["who"] for s in output["segment.csv"]} >= {"RS_DK", "TIM_SPK_0001"}
+    documents = output["document.csv"]
+    assert [d["docid"] for d in documents] == ["TOR_C_0001", "TOR_C_0001"]
+    assert json.loads(documents[0]["media"]) == {"audio": "TOR_C_0001.wav"}
+    # u1 goes from t619 (0s) to t620 (0.027s), u2 from t620 to t621 (2.39s)
+    assert [s["frame_range"] for s in output["segment.csv"][:2]] == ["[0,1)", "[0,59)"]
+    # the utterances of the second document come after the first document in time
+    first_end = int(documents[0]["frame_range"][1:-1].split(",")[1])
+    second_start = output["segment.csv"][len(utterances)]["frame_range"]
+    assert second_start == f"[{first_end},{first_end + 1})"
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_tei_builder_written():
+    """Test converting written TEI."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    input_dir = os.path.join(TMP_FOLDER, "input")
+    os.makedirs(input_dir, exist_ok=True)
+    with open(os.path.join(input_dir, "written.xml"), "w") as f:
+        f.write(TEI_STR)
+
+    output = convert(input_dir, os.path.join(TMP_FOLDER, "output"))
+    (document,) = output["document.csv"]
+    assert document["docid"] == "written1"
+    assert document["title"] == "A written text"
+    assert [p["parid"] for p in output["paragraph.csv"]] == ["p1", "p2"]
+    assert [s["sent"] for s in output["segment.csv"]] == ["s1", "s2", "s3"]
+    forms = {f["form_id"]: f["form"] for f in output["token_form.csv"]}
+    tokens = {forms[t["form_id"]]: t for t in output["token.csv"]}
+    assert tokens["world"]["spaceAfter"] == "0"
+    assert tokens["Hello"]["spaceAfter"] == ""
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
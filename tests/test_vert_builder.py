@@ -0,0 +1,119 @@
+import csv
+import gzip
+import json
+import os
+import re
+import shutil
+
+from lcpcli.corpert import Corpert
+from lcpcli.check_files import Checker
+
+TMP_FOLDER = os.path.join(os.path.dirname(__file__), "tmp_data")
+IN_VERT = os.path.join(
+    os.path.dirname(__file__), "..", "lcpcli", "data", "input", "in.vert"
+)
+UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+VERT_STR = """<doc id="d1" year="2001" title="Fish &amp; chips">
+<p id="p1">
+<s id="s1">
+Hello	hello	INTJ
+<g/>
+,	,	PUNCT
+world	world	NOUN	extra
+</s>
+<s id="s2">
+Bye	bye	INTJ
+</s>
+</p>
+<p id="p2">
+<s id="s3">
+Again	again	ADV
+</s>
+</p>
+</doc>
+<doc id="d2" year="2002">
+<s id="s4">
+<unknown foo="bar">
+Hi	hi	INTJ
+</unknown>
+</s>
+<s id="empty">
+</s>
+</doc>
+"""
+
+
+def convert(input_dir: str, output_dir: str, **kwargs) -> dict[str, list[dict]]:
+    """Convert and check input_dir, and read the output files with ranked UUIDs."""
+    os.makedirs(output_dir, exist_ok=True)
+    cor = Corpert(input_dir, output_dir, **kwargs)
+    cor.run(overwite_output=True)
+    conf = json.loads(open(os.path.join(output_dir, "config.json"), "r").read())
+    checker = Checker(conf)
+    checker.run_checks(output_dir, full=True, add_zero=False)
+    uuids: dict[str, str] = {}
+    output = {}
+    for fn in ["segment.csv", *sorted(os.listdir(output_dir))]:
+        if not fn.endswith(".csv"):
+            continue
+        with open(os.path.join(output_dir, fn), "r") as f:
+            content = UUID.sub(
+                lambda m: uuids.setdefault(m[0], f"UUID{len(uuids)}"), f.read()
+            )
+        output[fn] = list(csv.DictReader(content.splitlines()))
+    return output
+
+
+def test_vert_builder():
+    """Test converting the VERT file shipped with lcpcli."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    input_dir = os.path.join(TMP_FOLDER, "input")
+    os.makedirs(input_dir, exist_ok=True)
+    shutil.copy(IN_VERT, input_dir)
+
+    output = convert(input_dir, os.path.join(TMP_FOLDER, "output"))
+    assert [d["docid"] for d in output["document.csv"]] == ["in"]
+    assert len(output["segment.csv"]) == 3
+    assert len(output["token.csv"]) == 36
+    assert output["token.csv"][0]["pos"] == "PROPN"
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+
+
+def test_vert_builder_structures():
+    """Test mapping VERT structures and positional attributes, in parallel too."""
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)
+    input_dir = os.path.join(TMP_FOLDER, "input")
+    os.makedirs(input_dir, exist_ok=True)
+    with open(os.path.join(input_dir, "a.vert"), "w") as f:
+        f.write(VERT_STR)
+    with open(os.path.join(input_dir, "b.vrt.gz"), "wb") as f:
+        f.write(gzip.compress(open(IN_VERT, "rb").read()))
+
+    outputs = [
+        convert(input_dir, os.path.join(TMP_FOLDER, f"output{jobs}"), jobs=jobs)
+        for jobs in (1, 2)
+    ]
+    # the order of the files is not deterministic across runs
+    for output in outputs:
+        for rows in output.values():
+            rows.sort(key=lambda r: json.dumps(r, sort_keys=True))
+    assert outputs[0] == outputs[1]
+
+    output = outputs[0]
+    docs = {d["docid"]: d for d in output["document.csv"]}
+    assert sorted(docs) == ["d1", "d2", "in"]
+    assert docs["d1"]["title"] == "Fish & chips"
+    sentences = {s["sent"] for s in output["segment.csv"]}
+    assert {"s1", "s2", "s3", "s4"} <= sentences
+    assert "empty" not in sentences
+    assert len(output["paragraph.csv"]) == 2
+    forms = {f["form_id"]: f["form"] for f in output["token_form.csv"]}
+    tokens = {forms[t["form_id"]]: t for t in output["token.csv"]}
+    assert tokens["Hello"]["spaceAfter"] == "0"
+    assert tokens["world"]["col4"] == "extra"
+
+    # Clean up
+    shutil.rmtree(TMP_FOLDER, ignore_errors=True)